@@ -0,0 +1,65 @@
+"""
+Скорость экранирования исходящих сообщений (core/codec.py) против прежнего
+цикла из minechat_api: несколько str.replace и проверка isprintable()
+для каждого символа на Python. Перед замером проверяется, что результаты
+совпадают символ в символ.
+
+Заодно замеряется обратное преобразование для показа (unescape_control).
+
+    python benchmarks/bench_codec.py
+    python benchmarks/bench_codec.py --repeat 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.codec import escape_control, unescape_control  # noqa: E402
+
+
+def legacy_escape(text):
+    """Прежняя реализация minechat_api._escape_control."""
+    if text is None:
+        return ""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = text.replace("\\", "\\\\")
+    text = text.replace("\n", r"\n")
+    text = text.replace("\t", r"\t")
+    cleaned = []
+    for ch in text:
+        if ch == "\\" or ch.isprintable():
+            cleaned.append(ch)
+    return "".join(cleaned)
+
+
+CASES = {
+    "короткое": "Привет всем!",
+    "длинное 10 КБ": ("Съешь же ещё этих мягких французских булок, да выпей чаю. " * 180)[:10_000],
+    "многострочное": "\n".join(f"строка {i}:\tзначение C:\\path\\{i}" for i in range(200)),
+    "CRLF и управляющие": "\r\n".join(f"a\x00b\x07c\x1b[0m {i}" for i in range(200)),
+    "Unicode-пробелы": " ".join(f"слово\u00a0{i}\u200b" for i in range(500)),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    for name, text in CASES.items():
+        escaped = escape_control(text)
+        assert escaped == legacy_escape(text), name
+        assert "\n" not in escaped and "\r" not in escaped, name
+
+        old = min(timeit.repeat(lambda: legacy_escape(text), number=args.repeat, repeat=3)) / args.repeat
+        new = min(timeit.repeat(lambda: escape_control(text), number=args.repeat, repeat=3)) / args.repeat
+        back = min(timeit.repeat(lambda: unescape_control(escaped), number=args.repeat, repeat=3)) / args.repeat
+        print(f"{name:<18} {len(text):>6} симв.   "
+              f"старый цикл {old * 1e6:>8.1f} мкс   codec {new * 1e6:>7.1f} мкс   "
+              f"x{old / new:>5.1f}   unescape {back * 1e6:>6.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
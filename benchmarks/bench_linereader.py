@@ -0,0 +1,105 @@
+"""
+Сравнение чтения чата: StreamReader.readline() + decode на каждую строку
+против LineProtocol (core/linereader.py), который режет и декодирует строки
+пачками.
+
+Локальный сервер отдаёт N строк и закрывает соединение; для каждого способа
+печатается скорость (строк/с) и, по tracemalloc, сколько блоков памяти
+на строку остаётся жить после прогона и пиковый объём трассируемой памяти
+на строку (временные буферы, bytes-объекты строк и т.п.).
+
+    python benchmarks/bench_linereader.py --lines 500000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.linereader import open_line_reader  # noqa: E402
+
+
+SAMPLE = "[16.10.26 12:00] Игрок_42: привет, кто идёт в шахту? ⛏\n"
+
+
+async def serve(lines: int, chunk_lines: int = 1000):
+    payload = (SAMPLE * chunk_lines).encode()
+
+    async def handle(reader, writer):
+        left = lines
+        while left > 0:
+            n = min(left, chunk_lines)
+            writer.write(payload if n == chunk_lines else (SAMPLE * n).encode())
+            await writer.drain()
+            left -= n
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def read_streamreader(port: int, sink: list):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        sink.append(line.decode("utf-8", errors="replace").rstrip("\n"))
+    writer.close()
+
+
+async def read_protocol(port: int, sink: list):
+    reader = await open_line_reader("127.0.0.1", port)
+    while True:
+        lines = await reader.read_batch()
+        if not lines:
+            break
+        sink.extend(lines)
+    reader.close()
+
+
+def count_blocks(snapshot_before, snapshot_after) -> int:
+    return sum(max(stat.count_diff, 0) for stat in snapshot_after.compare_to(snapshot_before, "filename"))
+
+
+async def run(name: str, reader, lines: int, trace: bool):
+    server = await serve(lines)
+    port = server.sockets[0].getsockname()[1]
+    sink = []
+    if trace:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+    started = time.perf_counter()
+    await reader(port, sink)
+    elapsed = time.perf_counter() - started
+    blocks = peak = None
+    if trace:
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # строки-результаты живут в sink и считаются одинаково для обоих способов
+        blocks = count_blocks(before, after) / max(len(sink), 1)
+        peak /= max(len(sink), 1)
+    server.close()
+    await server.wait_closed()
+    assert len(sink) == lines, (name, len(sink))
+    return elapsed, blocks, peak
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, reader in (("readline", read_streamreader), ("protocol", read_protocol)):
+        best = min([(await run(name, reader, args.lines, trace=False))[0] for _ in range(args.repeat)])
+        _, blocks, peak = await run(name, reader, min(args.lines, 50_000), trace=True)
+        print(f"{name:>9}: {args.lines / best:>12,.0f} строк/с   "
+              f"{blocks:.2f} блоков/строку   пик {peak:.0f} Б/строку")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+Пропускная способность и задержка отправки (core/sender.py) при разных
+размерах окна конвейера против локального сервера-заглушки.
+
+Заглушка повторяет протокол minechat: приветствие, токен -> JSON, промпт,
+затем на каждое сообщение (строки до пустой) отвечает промптом с задержкой
+`--rtt`, имитируя сетевую задержку. Окно 1 — прежнее поведение: одно
+сообщение на круг.
+
+С `--rate` и `--coalesce` видно, как ограничитель частоты и склейка
+коротких сообщений влияют на задержку в очереди.
+
+    python benchmarks/bench_sender.py --messages 500 --rtt 0.02 --windows 1 4 16
+    python benchmarks/bench_sender.py --messages 100 --rate 20 --burst 5 --coalesce 200
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.auth import Session  # noqa: E402
+from core.messages import OutgoingMessage  # noqa: E402
+from core.ratelimit import TokenBucket  # noqa: E402
+from core.sender import SendStats, send_msgs  # noqa: E402
+
+
+PROMPT = b"Message send. Write more\n"
+
+
+async def serve(rtt: float):
+    loop = asyncio.get_running_loop()
+
+    async def handle(reader, writer):
+        writer.write(b"Hello %username%! Enter your personal hash or leave it empty to create new account.\n")
+        await reader.readline()
+        writer.write(json.dumps({"nickname": "bench", "account_hash": "x"}).encode() + b"\n")
+        writer.write(b"Welcome to chat! Post your message below. End it with an empty line.\n")
+        body = ping_tail = False
+        while line := await reader.readline():
+            if line.strip():
+                body = True
+                continue
+            if ping_tail:
+                # вторая пустая строка пинга
+                ping_tail = False
+                continue
+            # пустая строка завершает сообщение или это пустой пинг "\n\n"
+            ping_tail = not body
+            body = False
+            loop.call_later(rtt, writer.write, PROMPT)
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def run(port: int, token_file: str, messages: int, window: int, rate: float, burst: int, coalesce: int):
+    queue = asyncio.Queue()
+    stats = SendStats()
+    for i in range(messages):
+        queue.put_nowait(OutgoingMessage(f"сообщение {i}"))
+    started = time.perf_counter()
+    task = asyncio.create_task(send_msgs(
+        Session("127.0.0.1", port, token_file), queue,
+        window=window, stats=stats, limiter=TokenBucket(rate, burst), coalesce_chars=coalesce,
+    ))
+    while stats.dequeued < messages or stats.acked < stats.sent - stats.pings:
+        if task.done():
+            break
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+    return elapsed, stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--rtt", type=float, default=0.01, help="задержка ответа заглушки, сек")
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rate", type=float, default=0, help="лимит отправок в секунду, 0 — без лимита")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--coalesce", type=int, default=0, help="склеивать сообщения до N символов")
+    args = parser.parse_args()
+
+    server = await serve(args.rtt)
+    port = server.sockets[0].getsockname()[1]
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({"account_hash": "x"}, f)
+    try:
+        for window in args.windows:
+            elapsed, stats = await run(port, f.name, args.messages, window, args.rate, args.burst, args.coalesce)
+            print(f"окно {window:>3}: {stats.dequeued / elapsed:>8,.0f} сообщ./с   "
+                  f"отправок {stats.sent}   "
+                  f"подтверждение: среднее {stats.latency_avg * 1000:.1f} мс, макс {stats.latency_max * 1000:.1f} мс   "
+                  f"в очереди: среднее {stats.queue_delay_avg * 1000:.1f} мс, макс {stats.queue_delay_max * 1000:.1f} мс")
+    finally:
+        os.unlink(f.name)
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
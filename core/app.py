@@ -1,30 +1,82 @@
 import asyncio
 import anyio
+import functools
 import logging
 from tkinter import messagebox
 import gui
 from utils import setup_logging, expand_path_and_mkdirs
 from core.config import parse_args
-from core.history import preload_history, save_messages
-from core.auth import authorise_or_raise
+from core.history import preload_history, save_messages, strip_ts
+from core.dedup import ReplayFilter
+from core.scrollback import pager_for
+from core.queues import make_queues, report_queue_stats
+from core.bus import MessageBus
+from core.segments import SegmentedHistory
+from core.history_db import SqliteHistory, IndexedHistory
+from core.auth import Session
 from core.exceptions import InvalidToken
 from core.connection import handle_connection
+from core.watchdog import Liveness, WATCHDOG_TIMEOUT_S, WATCHDOG_ALARM_AFTER
+from core.ratelimit import TokenBucket
+from core.backoff import Backoff
+from core import net
+from core.sender import SendStats
+from core.outbox import Outbox
 
 logger = logging.getLogger("app")
 
 
+def build_history_store(args):
+    if args.history_backend == "sqlite":
+        return SqliteHistory(expand_path_and_mkdirs(args.history_db), args.history_durability)
+    store = SegmentedHistory(
+        expand_path_and_mkdirs(args.history),
+        max_bytes=args.history_max_bytes,
+        daily=args.history_rotate_daily,
+        compress=not args.history_no_compress,
+    )
+    if args.history_index:
+        return IndexedHistory(store, SqliteHistory(expand_path_and_mkdirs(args.history_index), args.history_durability))
+    return store
+
+
+async def report_invalid_token(show_error, run, *args):
+    """Показывает InvalidToken, пока окно ещё открыто, и пробрасывает его дальше."""
+    try:
+        await run(*args)
+    except* InvalidToken as eg:
+        error = eg
+        while isinstance(error, BaseExceptionGroup):
+            error = error.exceptions[0]
+        show_error("Ошибка авторизации", str(error) or "Invalid token")
+        raise
+
+
 async def run_app():
     args = parse_args()
     setup_logging(args.log_level)
+    net.configure(args)
 
-    messages_queue = asyncio.Queue()
-    sending_queue = asyncio.Queue()
-    status_queue = asyncio.Queue()
-    save_queue = asyncio.Queue()
-    watchdog_queue = asyncio.Queue()
+    queues = make_queues(args.queue_limits)
+    sending_queue = queues["sending"]
+    status_queue = queues["status"]
+    liveness = Liveness()
+    # общие для всех переподключений: лимит не сбрасывается при реконнекте
+    send_stats = SendStats()
+    send_limiter = TokenBucket(args.send_rate, args.send_burst)
+    outbox = Outbox(expand_path_and_mkdirs(args.outbox)) if args.outbox else None
+    if outbox is not None:
+        outbox.open()
 
-    history_path = expand_path_and_mkdirs(args.history)
-    await preload_history(history_path, messages_queue)
+    # окно подписывается до подгрузки истории, запись истории — после:
+    # подгруженные строки нужно показать, но не сохранять повторно
+    bus = MessageBus(args.bus_capacity)
+    gui_feed = bus.subscribe("gui")
+    history = build_history_store(args)
+    preloaded = await preload_history(history, bus, args.preload_lines, args.preload_hours)
+    save_feed = bus.subscribe("history")
+    replay_filter = ReplayFilter(args.replay_window, args.replay_seconds)
+    replay_filter.seed(strip_ts(line) for line in preloaded)
 
     wd_handler = logging.StreamHandler()
     wd_handler.setFormatter(logging.Formatter("%(message)s"))
@@ -33,38 +85,80 @@ async def run_app():
     wlog.setLevel(logging.INFO)
     wlog.handlers = [wd_handler]
 
-    try:
-        async with anyio.create_task_group() as tg:
-            tg.start_soon(gui.draw, messages_queue, sending_queue, status_queue)
+    # в режиме --gui-thread Tk живёт в своём потоке: диалоги показывает он
+    tk_threads = []
+    draw = functools.partial(gui.draw_in_thread, on_start=tk_threads.append) if args.gui_thread else gui.draw
 
-            tg.start_soon(save_messages, history_path, save_queue)
+    def show_error(title, message):
+        if tk_threads:
+            tk_threads[0].show_error(title, message)
+        else:
+            messagebox.showerror(title, message)
 
-            tg.start_soon(authorise_or_raise, args.host, args.send_port, args.token_file,
-                          status_queue, watchdog_queue)
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(
+                draw,
+                gui_feed, sending_queue, status_queue,
+                history if hasattr(history, "search") else None,
+                args.max_panel_lines,
+                pager_for(history),
+                args.tk_max_interval,
+            )
 
             tg.start_soon(
-                handle_connection, args.host,
+                save_messages, history, save_feed,
+                args.history_flush_lines,
+                args.history_flush_interval,
+                args.history_durability,
+            )
+
+            connection = functools.partial(
+                handle_connection,
+                args.host,
                 args.port,
-                args.send_port,
-                args.token_file,
-                messages_queue,
-                save_queue,
+                Session(args.host, args.send_port, args.token_file),
+                bus,
                 sending_queue,
                 status_queue,
-                watchdog_queue,
-                5.0,
-                5,
-                1.0,
+                liveness,
+                watchdog_timeout=WATCHDOG_TIMEOUT_S,
+                watchdog_alarm_after=WATCHDOG_ALARM_AFTER,
+                watchdog_summary_interval=args.watchdog_summary_interval,
+                reconnect_backoff=functools.partial(
+                    Backoff, args.reconnect_delay, args.reconnect_max_delay,
+                    args.breaker_after, args.breaker_cooldown,
+                ),
+                replay_filter=replay_filter,
+                send_window=args.send_window,
+                send_stats=send_stats,
+                send_limiter=send_limiter,
+                send_coalesce_chars=args.send_coalesce_chars,
+                outbox=outbox,
+                heartbeat_min=args.heartbeat_min,
+                heartbeat_max=args.heartbeat_max,
             )
+            tg.start_soon(report_invalid_token, show_error, connection)
+
+            tg.start_soon(report_queue_stats, queues)
     except* gui.TkAppClosed:
         pass
 
     except* asyncio.CancelledError:
         pass
 
-    except* InvalidToken as eg:
-        try:
-            msg = str(eg.exceptions[0]) if eg.exceptions else "Invalid token"
-            messagebox.showerror("Ошибка авторизации", msg)
-        finally:
-            pass
+    except* InvalidToken:
+        # уже показано в report_invalid_token
+        pass
+
+    finally:
+        for name, queue in queues.items():
+            if queue.dropped or queue.coalesced or queue.blocked:
+                logger.info("queue %s: %s", name, queue.stats())
+        if outbox is not None:
+            outbox.close()
+        if send_stats.sent or send_stats.pings_fixed:
+            logger.info("send stats: %s, rate-limited %.1f s", send_stats.summary(), send_limiter.waited)
+        for feed in bus.subscriptions:
+            if feed.dropped:
+                logger.info("bus subscriber %s dropped %d messages", feed.name, feed.dropped)
@@ -1,73 +1,66 @@
-import asyncio
 import contextlib
-import json
-import os
+import logging
 import gui
+from minechat_api import login as mc_login
+from utils import load_token
 from core.exceptions import InvalidToken
-from core.watchdog import WD
-
-
-async def _readline_text(reader: asyncio.StreamReader) -> str:
-    data = await reader.readline()
-    if not data:
-        return ""
-    return data.decode("utf-8", errors="replace").rstrip("\n")
-
-
-def _load_token(token_file: str) -> str:
-    path = os.path.expanduser(token_file)
-    if not os.path.exists(path):
-        raise InvalidToken("Токен не найден. Сначала зарегистрируйтесь (register-minechat-user.py).")
-    try:
-        with open(path, encoding="utf-8") as f:
-            return json.load(f).get("account_hash")
-    except Exception as e:
-        raise InvalidToken(f"Не удалось прочитать токен: {e}")
-
-
-async def authorise_or_raise(
-    host: str,
-    port: int,
-    token_file: str,
-    status_queue=None,
-    watchdog_queue: asyncio.Queue | None = None,
-) -> str:
-    
-    """Возвращает nickname при успехе, иначе InvalidToken."""
-    token = _load_token(token_file)
-    reader = writer = None
-    try:
-        reader, writer = await asyncio.open_connection(host, port)
-
-        _ = await _readline_text(reader)
-        if watchdog_queue:
-            await watchdog_queue.put(WD.PROMPT)
-
-        writer.write(f"{token}\n".encode("utf-8"))
-        await writer.drain()
-
-        response = await _readline_text(reader)
+from core import net
+from core.watchdog import WD, Liveness
+
+
+logger = logging.getLogger("auth")
+
+
+class Session:
+    """
+    Авторизация на порту отправки. Токен читается из файла один раз и
+    хранится в памяти, ник запоминается после первой успешной авторизации.
+    `open()` открывает соединение и авторизуется на нём — это же соединение
+    потом используется для отправки, отдельного соединения только ради
+    проверки токена нет.
+    """
+
+    def __init__(self, host: str, port: int, token_file: str):
+        self.host = host
+        self.port = port
+        self.token_file = token_file
+        self.nickname = None
+        self.logins = 0
+        self._token = None
+
+    def load_token(self) -> str:
+        """Токен из файла (читается один раз); InvalidToken, если его нет или файл битый."""
+        if self._token is None:
+            self._token = load_token(self.token_file)
+        return self._token
+
+    async def open(self, status_queue=None, liveness: Liveness | None = None):
+        """
+        Авторизованное соединение `(reader, writer)`; при неверном токене
+        закрывает его и поднимает InvalidToken. Ник уходит в `status_queue`
+        только при первой авторизации или если он сменился.
+        """
+        token = self.load_token()
+        reader, writer = await net.open_connection(self.host, self.port)
         try:
-            payload = json.loads(response) if response else None
-        except json.JSONDecodeError:
-            payload = None
-
-        if not payload:
-            raise InvalidToken("Неизвестный токен. Проверьте его или зарегистрируйте заново.")
-
-        nickname = payload.get("nickname", "<unknown>")
-
-        if status_queue:
-            await status_queue.put(gui.NicknameReceived(nickname))
-
-        if watchdog_queue:
-            await watchdog_queue.put(WD.AUTH_OK)
-
-        return nickname
-
-    finally:
-        if writer:
+            if liveness:
+                liveness.touch(WD.PROMPT)
+            account = await mc_login(reader, writer, token)
+            if account is None:
+                raise InvalidToken("Неизвестный токен. Проверьте его или зарегистрируйте заново.")
+        except BaseException:
             with contextlib.suppress(Exception):
                 writer.close()
                 await writer.wait_closed()
-
+            raise
+
+        self.logins += 1
+        if liveness:
+            liveness.touch(WD.AUTH_OK)
+        nickname = account.get("nickname", "<unknown>")
+        if nickname != self.nickname:
+            logger.debug("authorised as %s", nickname)
+            self.nickname = nickname
+            if status_queue:
+                await status_queue.put(gui.NicknameReceived(nickname))
+        return reader, writer
@@ -0,0 +1,49 @@
+import logging
+import random
+
+from utils import RECONNECT_DELAY_START, RECONNECT_DELAY_MAX, BREAKER_AFTER, BREAKER_COOLDOWN
+
+
+logger = logging.getLogger("backoff")
+
+# соединение, проработавшее столько секунд, считается удачным: счёт сбоев сбрасывается
+STABLE_AFTER_S = 10.0
+
+
+class Backoff:
+    """
+    Пауза перед повторным подключением: экспоненциальный рост от `base`
+    до `cap` с полным джиттером — случайная пауза от 0 до текущего предела,
+    чтобы после перезапуска сервера клиенты не подключались все разом.
+
+    После `breaker_after` сбоев подряд размыкатель открывается: каждая
+    следующая попытка — не чаще раза в `cooldown` секунд (тоже со случайным
+    разбросом), пока какое-нибудь подключение не окажется удачным (`reset`).
+    `breaker_after` = 0 — без размыкателя.
+    """
+
+    def __init__(self, base: float = RECONNECT_DELAY_START, cap: float = RECONNECT_DELAY_MAX,
+                 breaker_after: int = BREAKER_AFTER, cooldown: float = BREAKER_COOLDOWN,
+                 rng: random.Random | None = None):
+        self.base = base
+        self.cap = max(base, cap)
+        self.breaker_after = breaker_after
+        self.cooldown = max(self.cap, cooldown)
+        self.failures = 0
+        self._rng = rng or random.Random()
+
+    @property
+    def breaker_open(self) -> bool:
+        return bool(self.breaker_after) and self.failures >= self.breaker_after
+
+    def failure(self) -> float:
+        """Отмечает сбой и возвращает паузу до следующей попытки, сек."""
+        self.failures += 1
+        if self.breaker_open:
+            if self.failures == self.breaker_after:
+                logger.warning("%d failures in a row, retrying every ~%.0fs", self.failures, self.cooldown)
+            return self._rng.uniform(self.cooldown / 2, self.cooldown)
+        return self._rng.uniform(0, min(self.cap, self.base * 2 ** min(self.failures - 1, 32)))
+
+    def reset(self):
+        self.failures = 0
@@ -0,0 +1,104 @@
+import asyncio
+import collections
+import itertools
+import logging
+
+
+logger = logging.getLogger("bus")
+
+BUS_CAPACITY = 100_000
+
+
+class MessageBus:
+    """
+    Широковещательная шина сообщений чата. Читатель публикует пачку строк
+    один раз, каждый подписчик читает её со своей позиции (курсора) и в своём
+    темпе; строки хранятся в одном кольцевом буфере, а не копируются в
+    очередь каждого потребителя.
+
+    Буфер держит строки, пока их не прочитали все подписчики, но не больше
+    `capacity`: отставший подписчик теряет самые старые строки (счётчик
+    `dropped` у подписки), а публикация никогда не ждёт.
+    """
+
+    def __init__(self, capacity: int = BUS_CAPACITY):
+        self.capacity = capacity
+        self.subscriptions = []
+        self._items = collections.deque()
+        self._first = 0
+        self._next = 0
+        self._published = asyncio.Event()
+
+    def publish(self, items):
+        if not items:
+            return
+        self._items.extend(items)
+        self._next += len(items)
+        self._trim()
+        self._published.set()
+        self._published = asyncio.Event()
+
+    def subscribe(self, name: str = "") -> "Subscription":
+        """Подписка с текущего конца шины: уже опубликованное она не увидит."""
+        subscription = Subscription(self, name, self._next)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+            self._trim()
+
+    def _trim(self):
+        floor = min((s._cursor for s in self.subscriptions), default=self._next)
+        if self.capacity:
+            floor = max(floor, self._next - self.capacity)
+        while self._first < floor:
+            self._items.popleft()
+            self._first += 1
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._items),
+            "published": self._next,
+            "dropped": {s.name: s.dropped for s in self.subscriptions},
+        }
+
+
+class Subscription:
+    """Курсор подписчика на `MessageBus`."""
+
+    def __init__(self, bus: MessageBus, name: str, cursor: int):
+        self.bus = bus
+        self.name = name
+        self.dropped = 0
+        self._cursor = cursor
+
+    def pending(self) -> int:
+        return self.bus._next - max(self._cursor, self.bus._first)
+
+    def get_batch_nowait(self, limit: int = 0) -> list:
+        """Всё непрочитанное (не больше `limit`, если задан) или пустой список."""
+        bus = self.bus
+        if self._cursor < bus._first:
+            self.dropped += bus._first - self._cursor
+            logger.warning("subscriber %s is lagging, skipped %d messages", self.name, bus._first - self._cursor)
+            self._cursor = bus._first
+        start = self._cursor - bus._first
+        end = len(bus._items) if not limit else min(len(bus._items), start + limit)
+        batch = list(itertools.islice(bus._items, start, end))
+        self._cursor = bus._first + end
+        bus._trim()
+        return batch
+
+    async def get_batch(self, limit: int = 0) -> list:
+        """
+        Ждёт новых сообщений и возвращает их пачкой. Отмена во время ожидания
+        безопасна: курсор сдвигается только при возврате пачки.
+        """
+        while self._cursor >= self.bus._next:
+            await self.bus._published.wait()
+        return self.get_batch_nowait(limit)
+
+    def close(self):
+        self.bus._unsubscribe(self)
@@ -0,0 +1,56 @@
+import re
+
+
+ENCODING = "utf-8"
+
+_CONTROL_RE = re.compile(r"[\x00-\x1f\x7f-\x9f]+")
+# у str.translate быстрый путь только для ASCII-строк, для остальных быстрее regex
+_CONTROL_TABLE = dict.fromkeys([*range(0x20), *range(0x7f, 0xa0)])
+
+
+def escape_control(text: str | None) -> str:
+    """
+    Делает данные безопасными для протокола «1 сообщение = 1 строка»:
+    переводы строк (\\r\\n, \\r, \\n) и табы превращаются в видимые \\n и \\t,
+    обратный слэш удваивается, NUL и прочие непечатаемые символы удаляются.
+    Обычный текст без управляющих символов и слэшей возвращается как есть.
+    """
+    if not text:
+        return ""
+    if text.isprintable() and "\\" not in text:
+        return text
+    # каждая замена — один проход на C, и только если символ вообще есть
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    if "\\" in text:
+        text = text.replace("\\", "\\\\")
+    if "\n" in text:
+        text = text.replace("\n", r"\n")
+    if "\t" in text:
+        text = text.replace("\t", r"\t")
+    if not text.isprintable():
+        text = text.translate(_CONTROL_TABLE) if text.isascii() else _CONTROL_RE.sub("", text)
+        if not text.isprintable():
+            # редкие непечатаемые вне C0/C1: NBSP, пробелы нулевой ширины, U+2028 и т.п.
+            text = "".join(filter(str.isprintable, text))
+    return text
+
+
+def unescape_control(text: str) -> str:
+    """Обратное `escape_control` для показа: видимые \\n и \\t снова становятся переводом строки и табом."""
+    if "\\" not in text:
+        return text
+    # сначала режем по удвоенному слэшу, чтобы \\n не стало слэшем и переводом строки
+    parts = text.split("\\\\")
+    return "\\".join(part.replace(r"\n", "\n").replace(r"\t", "\t") for part in parts)
+
+
+def decode_line(data: bytes) -> str:
+    """Строка протокола из байтов: UTF-8 с заменой битых байтов, без завершающего \\n."""
+    return data.decode(ENCODING, errors="replace").rstrip("\n")
+
+
+async def readline_text(reader) -> str:
+    """Считывает строку из StreamReader; пустая строка — соединение закрыто."""
+    data = await reader.readline()
+    return decode_line(data) if data else ""
@@ -1,11 +1,25 @@
 import os
+from gui import MAX_PANEL_LINES, TK_MAX_INTERVAL
+from core.history import DURABILITY_MODES, FLUSH_LINES, FLUSH_INTERVAL_S, PRELOAD_LINES
+from core.dedup import REPLAY_WINDOW_CAPACITY, REPLAY_DURATION_S
+from core.queues import parse_queue_limits
+from core.bus import BUS_CAPACITY
+from core.watchdog import SUMMARY_INTERVAL_S
+from core.sender import SEND_WINDOW, HEARTBEAT_MIN_S, HEARTBEAT_MAX_S, PING_ACK_TIMEOUT_S
+from core.net import add_net_args
+from core.ratelimit import SEND_RATE, SEND_BURST
 from utils import (
     build_parser,
     DEFAULT_HOST,
     DEFAULT_LISTEN_PORT,
     DEFAULT_HISTORY,
+    DEFAULT_HISTORY_DB,
     DEFAULT_SEND_PORT,
-    DEFAULT_TOKEN_FILE
+    DEFAULT_TOKEN_FILE,
+    DEFAULT_OUTBOX,
+    add_history_storage_args,
+    add_reconnect_args,
+    env_flag,
 )
 
 
@@ -20,6 +34,25 @@ def parse_args():
         default=os.getenv("MINECHAT_HISTORY", DEFAULT_HISTORY),
         help="Путь к файлу истории (ENV: MINECHAT_HISTORY)",
         )
+    add_history_storage_args(parser)
+    add_reconnect_args(parser)
+    add_net_args(parser)
+    parser.add_argument(
+        "--history-backend",
+        choices=("text", "sqlite"),
+        default=os.getenv("MINECHAT_HISTORY_BACKEND", "text"),
+        help="Хранилище истории: текстовые сегменты или SQLite с индексом по времени (ENV: MINECHAT_HISTORY_BACKEND)",
+        )
+    parser.add_argument(
+        "--history-db",
+        default=os.getenv("MINECHAT_HISTORY_DB", DEFAULT_HISTORY_DB),
+        help="Путь к базе истории для --history-backend sqlite (ENV: MINECHAT_HISTORY_DB)",
+        )
+    parser.add_argument(
+        "--history-index",
+        default=os.getenv("MINECHAT_HISTORY_INDEX"),
+        help="Поисковый индекс SQLite рядом с текстовой историей (ENV: MINECHAT_HISTORY_INDEX)",
+        )
     parser.add_argument(
         "--send-port",
         type=int,
@@ -31,4 +64,132 @@ def parse_args():
         default=os.getenv("MINECHAT_TOKEN_FILE", DEFAULT_TOKEN_FILE),
         help="Путь к файлу токена (ENV: MINECHAT_TOKEN_FILE)",
         )
-    return parser.parse_args()
+    parser.add_argument(
+        "--history-flush-lines",
+        type=int,
+        default=int(os.getenv("MINECHAT_HISTORY_FLUSH_LINES", FLUSH_LINES)),
+        help="Сбрасывать историю на диск каждые N строк (ENV: MINECHAT_HISTORY_FLUSH_LINES)",
+        )
+    parser.add_argument(
+        "--history-flush-interval",
+        type=float,
+        default=float(os.getenv("MINECHAT_HISTORY_FLUSH_INTERVAL", FLUSH_INTERVAL_S)),
+        help="Максимальная задержка сброса истории, сек (ENV: MINECHAT_HISTORY_FLUSH_INTERVAL)",
+        )
+    parser.add_argument(
+        "--history-durability",
+        choices=DURABILITY_MODES,
+        default=os.getenv("MINECHAT_HISTORY_DURABILITY", "flush"),
+        help="Режим надёжности записи истории (ENV: MINECHAT_HISTORY_DURABILITY)",
+        )
+    parser.add_argument(
+        "--preload-lines",
+        type=int,
+        default=int(os.getenv("MINECHAT_PRELOAD_LINES", PRELOAD_LINES)),
+        help="Сколько последних строк истории показать при старте, 0 — без ограничения (ENV: MINECHAT_PRELOAD_LINES)",
+        )
+    parser.add_argument(
+        "--preload-hours",
+        type=float,
+        default=float(os.getenv("MINECHAT_PRELOAD_HOURS", 0)),
+        help="Показать при старте историю только за последние N часов, 0 — без ограничения (ENV: MINECHAT_PRELOAD_HOURS)",
+        )
+    parser.add_argument(
+        "--replay-window",
+        type=int,
+        default=int(os.getenv("MINECHAT_REPLAY_WINDOW", REPLAY_WINDOW_CAPACITY)),
+        help="Сколько последних строк помнить для отсева повторов при переподключении (ENV: MINECHAT_REPLAY_WINDOW)",
+        )
+    parser.add_argument(
+        "--replay-seconds",
+        type=float,
+        default=float(os.getenv("MINECHAT_REPLAY_SECONDS", REPLAY_DURATION_S)),
+        help="Сколько секунд после подключения отсеивать повторы, 0 — не отсеивать (ENV: MINECHAT_REPLAY_SECONDS)",
+        )
+    parser.add_argument(
+        "--max-panel-lines",
+        type=int,
+        default=int(os.getenv("MINECHAT_MAX_PANEL_LINES", MAX_PANEL_LINES)),
+        help="Сколько строк держать в окне чата, 0 — без ограничения (ENV: MINECHAT_MAX_PANEL_LINES)",
+        )
+    parser.add_argument(
+        "--tk-max-interval",
+        type=float,
+        default=float(os.getenv("MINECHAT_TK_MAX_INTERVAL", TK_MAX_INTERVAL)),
+        help="Максимальная пауза опроса окна в простое, сек (ENV: MINECHAT_TK_MAX_INTERVAL)",
+        )
+    parser.add_argument(
+        "--gui-thread",
+        action="store_true",
+        default=env_flag("MINECHAT_GUI_THREAD"),
+        help="Запускать окно в отдельном потоке, чтобы отрисовка не задерживала сеть (ENV: MINECHAT_GUI_THREAD)",
+        )
+    parser.add_argument(
+        "--send-window",
+        type=int,
+        default=int(os.getenv("MINECHAT_SEND_WINDOW", SEND_WINDOW)),
+        help="Сколько сообщений отправлять подряд, не дожидаясь подтверждения сервера, 1 — по одному (ENV: MINECHAT_SEND_WINDOW)",
+        )
+    parser.add_argument(
+        "--outbox",
+        default=os.getenv("MINECHAT_OUTBOX", DEFAULT_OUTBOX),
+        help="Журнал неподтверждённых исходящих сообщений, пустая строка — без журнала (ENV: MINECHAT_OUTBOX)",
+        )
+    parser.add_argument(
+        "--send-rate",
+        type=float,
+        default=float(os.getenv("MINECHAT_SEND_RATE", SEND_RATE)),
+        help="Не больше N отправок в секунду в среднем, 0 — без ограничения (ENV: MINECHAT_SEND_RATE)",
+        )
+    parser.add_argument(
+        "--send-burst",
+        type=int,
+        default=int(os.getenv("MINECHAT_SEND_BURST", SEND_BURST)),
+        help="Сколько отправок допускается подряд без паузы (ENV: MINECHAT_SEND_BURST)",
+        )
+    parser.add_argument(
+        "--send-coalesce-chars",
+        type=int,
+        default=int(os.getenv("MINECHAT_SEND_COALESCE_CHARS", 0)),
+        help="Склеивать подряд идущие сообщения в одно до N символов, 0 — не склеивать (ENV: MINECHAT_SEND_COALESCE_CHARS)",
+        )
+    parser.add_argument(
+        "--heartbeat-min",
+        type=float,
+        default=float(os.getenv("MINECHAT_HEARTBEAT_MIN", HEARTBEAT_MIN_S)),
+        help="Пинг, если соединение молчит столько секунд; интервал растёт после каждого ответа на пинг (ENV: MINECHAT_HEARTBEAT_MIN)",
+        )
+    parser.add_argument(
+        "--heartbeat-max",
+        type=float,
+        default=float(os.getenv("MINECHAT_HEARTBEAT_MAX", HEARTBEAT_MAX_S)),
+        help="Предел роста интервала пинга, сек; держите меньше порога watchdog чтения: в тихом чате его продлевают только ответы на пинги (ENV: MINECHAT_HEARTBEAT_MAX)",
+        )
+    parser.add_argument(
+        "--watchdog-summary-interval",
+        type=float,
+        default=float(os.getenv("MINECHAT_WATCHDOG_SUMMARY_INTERVAL", SUMMARY_INTERVAL_S)),
+        help="Как часто watchdog пишет сводку активности соединения, сек (ENV: MINECHAT_WATCHDOG_SUMMARY_INTERVAL)",
+        )
+    parser.add_argument(
+        "--bus-capacity",
+        type=int,
+        default=int(os.getenv("MINECHAT_BUS_CAPACITY", BUS_CAPACITY)),
+        help="Сколько непрочитанных сообщений шина держит для отстающего подписчика (ENV: MINECHAT_BUS_CAPACITY)",
+        )
+    parser.add_argument(
+        "--queue",
+        action="append",
+        default=[os.getenv("MINECHAT_QUEUES", "")],
+        metavar="NAME=SIZE[:POLICY]",
+        help="Размер и политика переполнения очереди: sending, status; "
+             "политики block, drop_oldest, coalesce (ENV: MINECHAT_QUEUES, через запятую)",
+        )
+    args = parser.parse_args()
+    try:
+        args.queue_limits = parse_queue_limits(args.queue)
+    except ValueError as e:
+        parser.error(f"--queue: {e}")
+    if args.heartbeat_min < PING_ACK_TIMEOUT_S:
+        parser.error(f"--heartbeat-min: не меньше {PING_ACK_TIMEOUT_S:g} с (время ожидания ответа на пинг)")
+    return args
@@ -1,11 +1,21 @@
 import anyio
 import asyncio
-import anyio
+import functools
 import logging
 
+from core.auth import Session
+from core.backoff import Backoff
+from core.bus import MessageBus
 from core.reader import read_msgs
-from core.sender import send_msgs
-from core.watchdog import watch_for_connection
+from core.supervisor import ChannelSupervisor
+from core.sender import send_msgs, SEND_WINDOW, HEARTBEAT_MIN_S, HEARTBEAT_MAX_S
+from core.watchdog import (
+    Liveness,
+    watch_for_connection,
+    SUMMARY_INTERVAL_S,
+    WATCHDOG_TIMEOUT_S,
+    WATCHDOG_ALARM_AFTER,
+)
 
 
 logger = logging.getLogger("conn")
@@ -14,48 +24,75 @@ logger = logging.getLogger("conn")
 async def handle_connection(
     host: str,
     listen_port: int,
-    send_port: int,
-    token_file: str,
-    gui_queue: asyncio.Queue,
-    save_queue: asyncio.Queue,
+    session: Session,
+    bus: MessageBus,
     sending_queue: asyncio.Queue,
     status_queue: asyncio.Queue,
-    watchdog_queue: asyncio.Queue,
-    watchdog_timeout: float = 1.0,
-    watchdog_alarm_after: int = 1,
+    liveness: Liveness,
+    *,
+    watchdog_timeout: float = WATCHDOG_TIMEOUT_S,
+    watchdog_alarm_after: int = WATCHDOG_ALARM_AFTER,
+    watchdog_summary_interval: float = SUMMARY_INTERVAL_S,
     reconnect_delay: float = 1.0,
+    reconnect_backoff=None,
+    replay_filter=None,
+    send_window: int = SEND_WINDOW,
+    send_stats=None,
+    send_limiter=None,
+    send_coalesce_chars: int = 0,
+    outbox=None,
+    heartbeat_min: float = HEARTBEAT_MIN_S,
+    heartbeat_max: float = HEARTBEAT_MAX_S,
 ):
     """
-    Запускает read_msgs, send_msgs и watch_for_connection в одной TaskGroup.
-    Когда watchdog кидает ConnectionError — плавно отменяет задачи и переподключается.
+    Запускает каналы чтения и отправки, каждый под своим `ChannelSupervisor`:
+    сбой одного канала перезапускает только его. watch_for_connection следит
+    за чтением; ответы сервера на отправку тоже считаются его активностью.
+    `reconnect_backoff` — фабрика `Backoff`, по умолчанию от `reconnect_delay`.
     """
-    while True:
-        try:
-            try:
-                async with anyio.create_task_group() as tg:
-                    tg.start_soon(
-                        read_msgs, host, listen_port,
-                        gui_queue, save_queue,
-                        status_queue, watchdog_queue,
-                    )
-                    tg.start_soon(
-                        send_msgs, host, send_port,
-                        sending_queue, token_file,
-                        status_queue, watchdog_queue,
-                    )
-                    tg.start_soon(
-                        watch_for_connection, watchdog_queue,
-                        watchdog_timeout, watchdog_alarm_after,
-                    )
-
-            except* ConnectionError as eg:
-                first = eg.exceptions[0] if eg.exceptions else None
-                logger.info(
-                    "watchdog/conn error → переподключение%s. Ждём %.1fs…",
-                    f" ({first})" if first else "",
-                    reconnect_delay,
-                )
-                await asyncio.sleep(reconnect_delay)
-
-        except anyio.get_cancelled_exc_class():
-            raise
+    reconnect_backoff = reconnect_backoff or (lambda: Backoff(reconnect_delay))
+    read_liveness = Liveness(parent=liveness)
+
+    async def read_channel(established):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(functools.partial(
+                read_msgs, host, listen_port, bus,
+                status_queue=status_queue,
+                liveness=read_liveness,
+                replay_filter=replay_filter,
+                on_established=established,
+            ))
+            tg.start_soon(
+                watch_for_connection, read_liveness,
+                watchdog_timeout, watchdog_alarm_after,
+                watchdog_summary_interval,
+            )
+
+    async def send_channel(established):
+        await send_msgs(
+            session, sending_queue,
+            status_queue=status_queue,
+            liveness=liveness,
+            ack_liveness=read_liveness,
+            on_established=established,
+            window=send_window,
+            stats=send_stats,
+            limiter=send_limiter,
+            coalesce_chars=send_coalesce_chars,
+            outbox=outbox,
+            heartbeat_min=heartbeat_min,
+            heartbeat_max=heartbeat_max,
+        )
+
+    supervisors = [
+        ChannelSupervisor("read", read_channel, reconnect_backoff(), status_queue),
+        ChannelSupervisor("send", send_channel, reconnect_backoff(), status_queue),
+    ]
+    try:
+        async with anyio.create_task_group() as tg:
+            for supervisor in supervisors:
+                tg.start_soon(supervisor.run)
+    finally:
+        for supervisor in supervisors:
+            if supervisor.restarts:
+                logger.info("%s channel: %s", supervisor.name, supervisor.stats())
@@ -0,0 +1,81 @@
+import collections
+import hashlib
+import logging
+import time
+
+
+logger = logging.getLogger("dedup")
+
+REPLAY_WINDOW_CAPACITY = 5000
+REPLAY_DURATION_S = 3.0
+
+
+class ReplayFilter:
+    """
+    Отсекает повтор последних сообщений, который сервер присылает после
+    переподключения. Помнит дайджесты последних `capacity` строк (кольцевое
+    окно, проверка за O(1)). `start_replay` запоминает, сколько раз каждая
+    строка встретилась до подключения; в течение `replay_s` секунд после
+    него строка отбрасывается, только пока не исчерпаны эти повторы —
+    сервер повторяет лишь то, что было до подключения. Реплика, впервые
+    пришедшая уже после подключения, и повторы вне окна пропускаются:
+    одинаковые реплики в живом чате — не дубликаты.
+    """
+
+    def __init__(self, capacity: int = REPLAY_WINDOW_CAPACITY, replay_s: float = REPLAY_DURATION_S):
+        self.capacity = capacity
+        self.replay_s = replay_s
+        self.suppressed = 0
+        self._window = collections.deque()
+        self._counts = {}
+        self._replay_until = 0.0
+        self._replay_suppressed = 0
+        self._before_connect = {}
+
+    @staticmethod
+    def _key(line: str) -> bytes:
+        return hashlib.blake2b(line.rstrip().encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def _remember(self, key: bytes):
+        self._window.append(key)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        if len(self._window) > self.capacity:
+            old = self._window.popleft()
+            left = self._counts[old] - 1
+            if left:
+                self._counts[old] = left
+            else:
+                del self._counts[old]
+
+    def seed(self, lines):
+        """Заполняет окно строками, которые уже есть в истории."""
+        for line in lines:
+            self._remember(self._key(line))
+
+    def start_replay(self):
+        self._finish_replay()
+        # повтор содержит только строки, виденные до подключения
+        self._before_connect = dict(self._counts)
+        self._replay_until = time.monotonic() + self.replay_s
+
+    def _finish_replay(self):
+        if self._replay_suppressed:
+            logger.info("отброшено повторов после переподключения: %d (всего %d)",
+                        self._replay_suppressed, self.suppressed)
+        self._replay_suppressed = 0
+        self._replay_until = 0.0
+        self._before_connect = {}
+
+    def accept(self, line: str) -> bool:
+        """True — строку надо показать и сохранить, False — это повтор."""
+        key = self._key(line)
+        if self._replay_until:
+            if time.monotonic() > self._replay_until:
+                self._finish_replay()
+            elif self._before_connect.get(key):
+                self._before_connect[key] -= 1
+                self.suppressed += 1
+                self._replay_suppressed += 1
+                return False
+        self._remember(key)
+        return True
@@ -1,29 +1,179 @@
+import asyncio
+import collections
 import os
 import datetime as dt
-import aiofiles
-from utils import expand_path_and_mkdirs
+import anyio
+import async_timeout
 
 
-def _now_ts() -> str:
-    return dt.datetime.now().strftime("[%d.%m.%y %H:%M]")
+DURABILITY_MODES = ("lazy", "flush", "fsync")
+FLUSH_LINES = 200
+FLUSH_INTERVAL_S = 1.0
+PRELOAD_LINES = 1000
+TAIL_BLOCK_SIZE = 64 * 1024
+TS_FORMAT = "[%d.%m.%y %H:%M]"
+TS_LEN = len("[dd.mm.yy HH:MM]")
 
 
-async def preload_history(filepath: str, gui_queue):
-    """Читает файл построчно и кладёт строки в очередь GUI."""
-    path = os.path.expanduser(filepath)
-    if not os.path.exists(path):
-        return
-    async with aiofiles.open(path, "r", encoding="utf-8") as f:
-        async for line in f:
-            await gui_queue.put(line.rstrip("\n"))
+def format_line(ts: dt.datetime, text: str) -> str:
+    """Строка истории в формате `[dd.mm.yy HH:MM] текст`."""
+    return f"{ts.strftime(TS_FORMAT)} {text.rstrip()}"
 
 
-async def save_messages(filepath: str, save_queue):
-    """Берёт строки из очереди и дописывает в историю с таймстемпом."""
-    path = expand_path_and_mkdirs(filepath)
-    async with aiofiles.open(path, "a", encoding="utf-8") as f:
+def parse_ts(line: str) -> dt.datetime | None:
+    """Достаёт время из префикса `[dd.mm.yy HH:MM]`, если он есть."""
+    if not line.startswith("[") or len(line) < TS_LEN:
+        return None
+    try:
+        return dt.datetime.strptime(line[:TS_LEN], TS_FORMAT)
+    except ValueError:
+        return None
+
+
+def strip_ts(line: str) -> str:
+    """Текст строки истории без префикса со временем."""
+    return line[TS_LEN + 1:] if parse_ts(line) is not None else line
+
+
+def tail_lines(f, max_lines: int = 0, since: dt.datetime | None = None,
+               block_size: int = TAIL_BLOCK_SIZE) -> list[str]:
+    """
+    Читает бинарный файл `f` с конца блоками и возвращает последние строки в прямом порядке.
+    Останавливается, когда набрано `max_lines` строк (0 — без ограничения) или
+    встретилась строка старше `since`. Время работы зависит только от объёма
+    возвращаемого хвоста, а не от размера файла.
+    """
+    picked = []
+    pos = f.seek(0, os.SEEK_END)
+    rest = b""
+    while pos > 0:
+        size = min(block_size, pos)
+        pos -= size
+        f.seek(pos)
+        parts = (f.read(size) + rest).split(b"\n")
+        rest = parts[0] if pos > 0 else b""
+        for raw in reversed(parts if pos == 0 else parts[1:]):
+            if not raw and not picked:
+                continue
+            line = raw.decode("utf-8", errors="replace").rstrip("\r")
+            if since is not None:
+                ts = parse_ts(line)
+                if ts is not None and ts < since:
+                    return picked[::-1]
+            picked.append(line)
+            if max_lines and len(picked) >= max_lines:
+                return picked[::-1]
+    return picked[::-1]
+
+
+def tail_lines_forward(f, max_lines: int = 0, since: dt.datetime | None = None) -> list[str]:
+    """
+    То же, что `tail_lines`, для потоков без перемотки назад (gzip): один
+    проход от начала, в памяти держится только хвост из `max_lines` строк.
+    """
+    picked = collections.deque(maxlen=max_lines or None)
+    blanks = 0
+    for raw in f:
+        line = raw.rstrip(b"\n").decode("utf-8", errors="replace").rstrip("\r")
+        if not line:
+            # пустые строки в конце файла не считаются
+            blanks += 1
+            continue
+        if since is not None:
+            ts = parse_ts(line)
+            if ts is not None and ts < since:
+                picked.clear()
+                blanks = 0
+                continue
+        picked.extend([""] * blanks)
+        blanks = 0
+        picked.append(line)
+    return list(picked)
+
+
+def _stamp_batch(messages) -> list[tuple[dt.datetime, str]]:
+    """Записи для хранилища со временем получения сообщений, а не временем записи."""
+    stamps = {}
+    entries = []
+    for msg in messages:
+        ts = stamps.get(msg.received)
+        if ts is None:
+            ts = stamps[msg.received] = msg.received_at
+        entries.append((ts, str(msg)))
+    return entries
+
+
+async def _sync(store, durability: str):
+    """
+    Сбрасывает буфер хранилища согласно режиму надёжности. Даже в `lazy`
+    SQLite фиксирует транзакцию: иначе вся сессия висела бы одной открытой
+    транзакцией, невидимой другим процессам.
+    """
+    await asyncio.to_thread(store.flush, durability == "fsync")
+
+
+async def preload_history(store, bus, max_lines: int = PRELOAD_LINES, since_hours: float = 0):
+    """
+    Публикует в шину хвост истории: не больше `max_lines` последних строк
+    и не старше `since_hours` часов (0 — без ограничения). Возвращает эти строки.
+    Увидят их только подписчики, подписавшиеся до вызова.
+    """
+    since = dt.datetime.now() - dt.timedelta(hours=since_hours) if since_hours else None
+    lines = await asyncio.to_thread(store.tail, max_lines, since)
+    bus.publish(lines)
+    return lines
+
+
+async def save_messages(
+    store,
+    feed,
+    flush_lines: int = FLUSH_LINES,
+    flush_interval: float = FLUSH_INTERVAL_S,
+    durability: str = "flush",
+):
+    """
+    Групповая запись истории: забирает из подписки на шину всё накопившееся, пишет
+    одним вызовом и сбрасывает буфер, когда набралось `flush_lines` строк
+    или прошло `flush_interval` секунд с первой несброшенной строки.
+
+    Режимы надёжности:
+      - lazy  — в ОС по порогам, SQLite без ожидания диска (synchronous=OFF);
+      - flush — сброс в ОС по порогам;
+      - fsync — сброс в ОС и fsync на диск по порогам.
+
+    При отмене дописывает непрочитанный остаток, сбрасывает буфер и закрывает хранилище.
+    """
+    if durability not in DURABILITY_MODES:
+        raise ValueError(f"unknown durability mode: {durability}")
+
+    loop = asyncio.get_running_loop()
+    await asyncio.to_thread(store.open)
+    unflushed = 0
+    deadline = None
+    try:
         while True:
-            msg = await save_queue.get()
-            stamped = f"{_now_ts()} {msg.rstrip()}"
-            await f.write(stamped + "\n")
-            await f.flush()
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                async with async_timeout.timeout(timeout):
+                    batch = await feed.get_batch()
+            except asyncio.TimeoutError:
+                await _sync(store, durability)
+                unflushed, deadline = 0, None
+                continue
+
+            with anyio.CancelScope(shield=True):
+                await asyncio.to_thread(store.append, _stamp_batch(batch))
+            unflushed += len(batch)
+            if deadline is None:
+                deadline = loop.time() + flush_interval
+
+            if unflushed >= flush_lines:
+                await _sync(store, durability)
+                unflushed, deadline = 0, None
+    finally:
+        with anyio.CancelScope(shield=True):
+            rest = feed.get_batch_nowait()
+            if rest:
+                await asyncio.to_thread(store.append, _stamp_batch(rest))
+            await _sync(store, "fsync" if durability == "fsync" else "flush")
+            await asyncio.to_thread(store.close)
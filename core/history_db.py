@@ -0,0 +1,239 @@
+import datetime as dt
+import logging
+import os
+import sqlite3
+import threading
+
+from core.history import TS_LEN, format_line, parse_ts
+from core.segments import iter_history_lines
+
+
+logger = logging.getLogger("history_db")
+
+IMPORT_BATCH = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id   INTEGER PRIMARY KEY,
+    ts   REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_ts ON messages (ts);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    lines  INTEGER NOT NULL,
+    at     REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    text, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+SEARCH_LIMIT = 200
+# режим надёжности истории -> PRAGMA synchronous
+SYNCHRONOUS = {"lazy": "OFF", "flush": "NORMAL", "fsync": "FULL"}
+
+
+def fts_query(text: str) -> str:
+    """Превращает пользовательский ввод в запрос FTS5: все слова должны встретиться."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class SqliteHistory:
+    """
+    Индексированная история в SQLite: поиск по диапазону времени без
+    линейного прохода по файлу. Интерфейс совпадает с `SegmentedHistory`
+    (open / append / flush / close / tail), так что `save_messages` и
+    `preload_history` работают с обоими хранилищами.
+
+    Записи копятся в открытой транзакции и фиксируются при `flush`.
+    Полнотекстовый индекс FTS5 обновляется триггером при каждой вставке.
+    Режим `synchronous` выбирается один раз при открытии по `durability`:
+    `fsync` — FULL (каждый commit доходит до диска), `flush` — NORMAL,
+    `lazy` — OFF (commit только передаёт данные ОС).
+    """
+
+    def __init__(self, path: str, durability: str = "flush"):
+        self.path = path
+        self.durability = durability
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={SYNCHRONOUS[self.durability]}")
+            had_fts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+            ).fetchone()
+            conn.executescript(SCHEMA)
+            if not had_fts:
+                # база создана до появления поиска — индексируем уже сохранённое
+                with conn:
+                    conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+            self._conn = conn
+        return self._conn
+
+    def open(self):
+        with self._lock:
+            self._connect()
+
+    def append(self, entries):
+        rows = [(ts.timestamp(), text.rstrip()) for ts, text in entries]
+        with self._lock:
+            self._connect().executemany("INSERT INTO messages (ts, text) VALUES (?, ?)", rows)
+
+    def flush(self, fsync: bool = False):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.commit()
+            if fsync and self.durability != "fsync":
+                # в режимах NORMAL и OFF commit не ждёт диска — явная точка fsync
+                self._conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    def _select(self, sql: str, params=()) -> list[tuple[float, str]]:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def tail(self, max_lines: int = 0, since: dt.datetime | None = None) -> list[str]:
+        where = "WHERE ts >= ?" if since is not None else ""
+        params = (since.timestamp(),) if since is not None else ()
+        limit = f"LIMIT {int(max_lines)}" if max_lines else ""
+        rows = self._select(f"SELECT ts, text FROM messages {where} ORDER BY id DESC {limit}", params)
+        return [format_line(dt.datetime.fromtimestamp(ts), text) for ts, text in reversed(rows)]
+
+    def range(self, start: dt.datetime | None = None, end: dt.datetime | None = None) -> list[str]:
+        """Строки истории с `start` (включительно) до `end` (не включительно)."""
+        rows = self._select(
+            "SELECT ts, text FROM messages WHERE ts >= ? AND ts < ? ORDER BY ts, id",
+            (
+                start.timestamp() if start else float("-inf"),
+                end.timestamp() if end else float("inf"),
+            ),
+        )
+        return [format_line(dt.datetime.fromtimestamp(ts), text) for ts, text in rows]
+
+    def page(self, before_id: int | None, limit: int, offset: int = 0) -> list[tuple[int, dt.datetime, str]]:
+        """
+        Страница истории для прокрутки: до `limit` записей `(id, время, текст)`
+        от новых к старым с id меньше `before_id` (None — с конца истории),
+        пропустив `offset` записей.
+        """
+        where = "WHERE id < ?" if before_id is not None else ""
+        params = (before_id,) if before_id is not None else ()
+        rows = self._select(
+            f"SELECT id, ts, text FROM messages {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+            params + (max(0, limit), max(0, offset)),
+        )
+        return [(msg_id, dt.datetime.fromtimestamp(ts), text) for msg_id, ts, text in rows]
+
+    def search(self, text: str, limit: int = SEARCH_LIMIT) -> list[str]:
+        """Полнотекстовый поиск: последние `limit` строк, содержащих все слова запроса."""
+        query = fts_query(text)
+        if not query:
+            return []
+        rows = self._select(
+            "SELECT m.ts, m.text FROM messages_fts f JOIN messages m ON m.id = f.rowid "
+            "WHERE messages_fts MATCH ? ORDER BY f.rowid DESC LIMIT ?",
+            (query, limit),
+        )
+        return [format_line(dt.datetime.fromtimestamp(ts), text) for ts, text in rows]
+
+    def import_text(self, history_path: str, force: bool = False) -> int:
+        """
+        Разовый импорт текстовой истории (все сегменты) пачками по `IMPORT_BATCH`
+        строк, каждая пачка — одна транзакция. Строки без таймстемпа получают
+        время предыдущей строки. Повторный импорт того же файла пропускается,
+        если не указан `force`.
+        """
+        source = os.path.abspath(history_path)
+        with self._lock:
+            conn = self._connect()
+            conn.commit()
+            if not force and conn.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone():
+                logger.info("already imported: %s", source)
+                return 0
+
+        count = 0
+        last_ts = dt.datetime.fromtimestamp(0)
+        batch = []
+        for line in iter_history_lines(history_path):
+            if not line:
+                continue
+            ts = parse_ts(line)
+            if ts is None:
+                batch.append((last_ts, line))
+            else:
+                last_ts = ts
+                batch.append((ts, line[TS_LEN + 1:]))
+            if len(batch) >= IMPORT_BATCH:
+                count += self._import_batch(batch)
+                batch = []
+        if batch:
+            count += self._import_batch(batch)
+
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO imports (source, lines, at) VALUES (?, ?, ?)",
+                    (source, count, dt.datetime.now().timestamp()),
+                )
+        return count
+
+    def _import_batch(self, batch) -> int:
+        rows = [(ts.timestamp(), text.rstrip()) for ts, text in batch]
+        with self._lock:
+            with self._connect() as conn:
+                conn.executemany("INSERT INTO messages (ts, text) VALUES (?, ?)", rows)
+        return len(rows)
+
+
+class IndexedHistory:
+    """
+    Текстовая история с поисковым индексом рядом: пишет в оба хранилища,
+    читает хвост из основного, ищет по индексу.
+    """
+
+    def __init__(self, primary, index: SqliteHistory):
+        self.primary = primary
+        self.index = index
+
+    def open(self):
+        self.primary.open()
+        self.index.open()
+
+    def append(self, entries):
+        entries = list(entries)
+        self.primary.append(entries)
+        self.index.append(entries)
+
+    def flush(self, fsync: bool = False):
+        self.primary.flush(fsync)
+        self.index.flush(fsync)
+
+    def close(self):
+        self.primary.close()
+        self.index.close()
+
+    def tail(self, max_lines: int = 0, since: dt.datetime | None = None) -> list[str]:
+        return self.primary.tail(max_lines, since)
+
+    def search(self, text: str, limit: int = SEARCH_LIMIT) -> list[str]:
+        return self.index.search(text, limit)
@@ -0,0 +1,162 @@
+import asyncio
+import collections
+import logging
+import time
+
+from core import net
+
+
+logger = logging.getLogger("linereader")
+
+LINE_LIMIT = 2 ** 16
+HIGH_WATER_LINES = 50_000
+
+
+def _longest_line(data, end: int) -> int:
+    """Длина самой длинной строки в `data[:end]` (в байтах, без перевода строки)."""
+    longest = start = 0
+    while start <= end:
+        stop = data.find(b"\n", start, end)
+        if stop < 0:
+            stop = end
+        longest = max(longest, stop - start)
+        start = stop + 1
+    return longest
+
+
+class LineProtocol(asyncio.Protocol):
+    """
+    Построчное чтение поверх asyncio.Protocol вместо StreamReader.readline().
+    Каждый полученный из сокета кусок режется на строки целиком: байты до
+    последнего перевода строки декодируются одним вызовом (через memoryview,
+    без промежуточной копии) и разбиваются `str.split`, недописанный хвост
+    ждёт следующего куска. Читатель забирает все накопленные строки пачкой
+    через `read_batch` или, вместе со временем получения каждого куска,
+    через `read_timed_batch`.
+
+    Разбивать уже декодированный текст безопасно: в UTF-8 байт 0x0A не
+    встречается внутри многобайтовых символов.
+
+    Если в буфере больше `high_water` непрочитанных строк, чтение из сокета
+    приостанавливается до тех пор, пока потребитель их не заберёт. Любая
+    строка длиннее `limit` байт (и дописанная, и недописанная) обрывает
+    соединение с ValueError.
+    """
+
+    def __init__(self, limit: int = LINE_LIMIT, high_water: int = HIGH_WATER_LINES, encoding: str = "utf-8"):
+        self.limit = limit
+        self.high_water = high_water
+        self.encoding = encoding
+        self.transport = None
+        self._partial = bytearray()
+        self._lines = collections.deque()
+        self._buffered = 0
+        self._eof = False
+        self._exc = None
+        self._paused = False
+        self._waiter = None
+        self._closed = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._closed = asyncio.get_running_loop().create_future()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def data_received(self, data: bytes):
+        if self._partial:
+            self._partial += data
+            data = self._partial
+        end = data.rfind(b"\n")
+        if end < 0:
+            if data is not self._partial:
+                self._partial += data
+            if len(self._partial) > self.limit:
+                self._fail(ValueError(f"line is longer than {self.limit} bytes"))
+            return
+        # строки короче куска: проверяем каждую, только если кусок длиннее предела
+        if len(data) - end - 1 > self.limit or (end > self.limit and _longest_line(data, end) > self.limit):
+            self._fail(ValueError(f"line is longer than {self.limit} bytes"))
+            return
+        with memoryview(data) as view:
+            text = str(view[:end], self.encoding, "replace")
+            rest = bytes(view[end + 1:])
+        self._partial = bytearray(rest)
+        lines = text.split("\n")
+        self._lines.append((time.time(), lines))
+        self._buffered += len(lines)
+        if self._buffered >= self.high_water and not self._paused:
+            self._paused = True
+            self.transport.pause_reading()
+        self._wake()
+
+    def eof_received(self):
+        if self._partial:
+            # как и readline(), отдаём последнюю строку без перевода строки
+            self._lines.append((time.time(), [self._partial.decode(self.encoding, "replace")]))
+            self._buffered += 1
+            self._partial = bytearray()
+        self._eof = True
+        self._wake()
+
+    def connection_lost(self, exc):
+        if exc is not None and self._exc is None:
+            self._exc = exc
+        self._eof = True
+        self._wake()
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+
+    def _fail(self, exc):
+        self._exc = exc
+        self._partial = bytearray()
+        self.transport.close()
+        self._wake()
+
+    async def read_timed_batch(self) -> list[tuple[float, list[str]]]:
+        """
+        Все накопленные строки (без '\\n') кусками `(время получения, строки)`;
+        пустой список — сервер закрыл соединение. Ошибка соединения
+        пробрасывается, но только после того, как прочитаны все пришедшие
+        до неё строки.
+        """
+        while not self._lines:
+            if self._exc is not None:
+                raise self._exc
+            if self._eof:
+                return []
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        chunks = list(self._lines)
+        self._lines.clear()
+        self._buffered = 0
+        if self._paused:
+            self._paused = False
+            self.transport.resume_reading()
+        return chunks
+
+    async def read_batch(self) -> list[str]:
+        """То же, что `read_timed_batch`, но только строки, одним списком."""
+        chunks = await self.read_timed_batch()
+        if len(chunks) == 1:
+            return chunks[0][1]
+        return [line for _, lines in chunks for line in lines]
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    async def wait_closed(self):
+        if self._closed is not None:
+            await self._closed
+
+
+async def open_line_reader(host: str, port: int, limit: int = LINE_LIMIT, **kwargs) -> LineProtocol:
+    """Аналог asyncio.open_connection для построчного чтения пачками (через `net.connector`)."""
+    _, protocol = await net.create_connection(lambda: LineProtocol(limit), host, port, **kwargs)
+    return protocol
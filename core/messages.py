@@ -0,0 +1,66 @@
+import datetime as dt
+import sys
+import time
+
+
+NICKNAME_SEPARATOR = ": "
+MAX_NICKNAME_LEN = 64
+
+
+class ChatMessage:
+    """
+    Сообщение чата: время получения из сокета (секунды эпохи), ник автора
+    и текст после ника. Ники интернируются, так что у тысяч сообщений одного
+    автора одна строка ника; время получения общее у всех строк одного куска
+    данных из сокета. `str(message)` восстанавливает исходную строку чата.
+    Строки без ника (системные сообщения сервера) хранятся целиком в `text`.
+    """
+
+    __slots__ = ("received", "nickname", "text")
+
+    def __init__(self, received: float, nickname: str | None, text: str):
+        self.received = received
+        self.nickname = nickname
+        self.text = text
+
+    @classmethod
+    def parse(cls, line: str, received: float) -> "ChatMessage":
+        nickname, sep, text = line.partition(NICKNAME_SEPARATOR)
+        if not sep or not nickname or len(nickname) > MAX_NICKNAME_LEN:
+            return cls(received, None, line)
+        return cls(received, sys.intern(nickname), text)
+
+    @property
+    def received_at(self) -> dt.datetime:
+        return dt.datetime.fromtimestamp(self.received)
+
+    def __str__(self) -> str:
+        if self.nickname is None:
+            return self.text
+        return f"{self.nickname}{NICKNAME_SEPARATOR}{self.text}"
+
+    def __repr__(self) -> str:
+        return f"ChatMessage({self.received!r}, {self.nickname!r}, {self.text!r})"
+
+
+class OutgoingMessage:
+    """
+    Сообщение в очереди отправки: текст, момент постановки в очередь
+    (monotonic) и id в журнале исходящих (None, пока не записано).
+    """
+
+    __slots__ = ("text", "enqueued", "id")
+
+    def __init__(self, text: str, enqueued: float | None = None, id: int | None = None):
+        self.text = text
+        self.enqueued = time.monotonic() if enqueued is None else enqueued
+        self.id = id
+
+    def __repr__(self) -> str:
+        return f"OutgoingMessage({self.text!r}, {self.enqueued!r}, {self.id!r})"
+
+
+def parse_batch(lines, received: float) -> list[ChatMessage]:
+    """Сообщения из строк одного куска данных с общим временем получения."""
+    parse = ChatMessage.parse
+    return [parse(line, received) for line in lines]
@@ -0,0 +1,253 @@
+import asyncio
+import async_timeout
+import itertools
+import logging
+import os
+import socket
+import time
+
+
+logger = logging.getLogger("net")
+
+KEEPALIVE_PROBES = 3
+DNS_TTL_S = 300.0
+CONNECT_TIMEOUT_S = 10.0
+HAPPY_EYEBALLS_DELAY_S = 0.25
+
+
+def enable_keepalive(sock: socket.socket | None, idle_s: float, probes: int = KEEPALIVE_PROBES) -> bool:
+    """
+    Включает TCP keepalive ядра: после `idle_s` секунд тишины ядро шлёт
+    пробы каждые `idle_s / probes` секунд и рвёт соединение после `probes`
+    пропущенных ответов. Трафика приложения это не создаёт. Параметры
+    времени выставляются там, где ОС их поддерживает; возвращает False,
+    если keepalive выключен (`idle_s` <= 0) или сокета нет.
+    """
+    if sock is None or idle_s <= 0:
+        return False
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    idle = max(1, int(idle_s))
+    options = (
+        (getattr(socket, "TCP_KEEPIDLE", None), idle),
+        (getattr(socket, "TCP_KEEPALIVE", None), idle),  # macOS
+        (getattr(socket, "TCP_KEEPINTVL", None), max(1, idle // probes)),
+        (getattr(socket, "TCP_KEEPCNT", None), probes),
+    )
+    for option, value in options:
+        if option is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+            except OSError as e:
+                logger.debug("keepalive option %s not set: %s", option, e)
+    return True
+
+
+def _interleave(infos):
+    """Адреса вперемешку по семействам (RFC 8305), начиная с семейства первого адреса резолвера."""
+    families = {}
+    for info in infos:
+        families.setdefault(info[0], []).append(info)
+    return [
+        info
+        for group in itertools.zip_longest(*families.values())
+        for info in group
+        if info is not None
+    ]
+
+
+class Connector:
+    """
+    Общая точка открытия TCP-соединений для всех модулей и скриптов.
+
+      - адреса хоста кешируются на `dns_ttl` секунд: переподключение не ходит
+        в резолвер, а если резолвер недоступен, берётся просроченная запись;
+        когда ни один адрес из кеша не ответил, запись помечается просроченной:
+        следующее подключение спросит резолвер, но адреса остаются запасными;
+      - IPv4 и IPv6 адреса пробуются наперегонки (happy eyeballs): следующий
+        адрес стартует через `happy_eyeballs_delay` или сразу после отказа
+        предыдущего, побеждает первый подключившийся;
+      - на сокет ставятся TCP_NODELAY (короткие строки протокола не ждут
+        склейки), keepalive и размеры буферов;
+      - на всё подключение, вместе с резолвом, даётся `connect_timeout`.
+    """
+
+    def __init__(self, dns_ttl: float = DNS_TTL_S, connect_timeout: float = CONNECT_TIMEOUT_S,
+                 happy_eyeballs_delay: float = HAPPY_EYEBALLS_DELAY_S,
+                 keepalive: float = 0, rcvbuf: int = 0, sndbuf: int = 0):
+        self.dns_ttl = dns_ttl
+        self.connect_timeout = connect_timeout
+        self.happy_eyeballs_delay = happy_eyeballs_delay
+        self.keepalive = keepalive
+        self.rcvbuf = rcvbuf
+        self.sndbuf = sndbuf
+        self._dns = {}
+        self.resolves = 0
+        self.cache_hits = 0
+
+    async def resolve(self, host: str, port: int) -> list:
+        key = (host, port)
+        entry = self._dns.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.cache_hits += 1
+            return entry[1]
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            if entry is None:
+                raise
+            logger.info("resolver failed for %s (%s), using cached addresses", host, e)
+            return entry[1]
+        self.resolves += 1
+        infos = _interleave(infos)
+        self._dns[key] = (time.monotonic() + self.dns_ttl, infos)
+        return infos
+
+    def _tune(self, sock: socket.socket):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        if self.sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        enable_keepalive(sock, self.keepalive)
+
+    async def _attempt(self, info) -> socket.socket:
+        family, type_, proto, _, address = info
+        sock = socket.socket(family, type_, proto)
+        try:
+            sock.setblocking(False)
+            # буферы до connect: от них зависит окно TCP
+            self._tune(sock)
+            await asyncio.get_running_loop().sock_connect(sock, address)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    async def _race(self, infos) -> socket.socket:
+        queue = list(infos)
+        pending = set()
+        errors = []
+        winner = None
+        try:
+            while winner is None and (queue or pending):
+                if queue:
+                    pending.add(asyncio.create_task(self._attempt(queue.pop(0))))
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=self.happy_eyeballs_delay if queue else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        task.result().close()
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, socket.socket):
+                    result.close()
+        if winner is None:
+            raise errors[-1] if errors else OSError("no addresses to connect to")
+        return winner
+
+    async def connect(self, host: str, port: int) -> socket.socket:
+        """Подключённый неблокирующий сокет."""
+        try:
+            async with async_timeout.timeout(self.connect_timeout or None):
+                return await self._race(await self.resolve(host, port))
+        except OSError:
+            # в том числе TimeoutError; сервер мог переехать — в следующий раз спросим резолвер,
+            # а если и он недоступен, попробуем те же адреса
+            entry = self._dns.get((host, port))
+            if entry is not None:
+                self._dns[(host, port)] = (0.0, entry[1])
+            raise
+
+    async def open_connection(self, host: str, port: int, **kwargs):
+        """Как asyncio.open_connection, но через кеш адресов и с настройкой сокета."""
+        sock = await self.connect(host, port)
+        return await asyncio.open_connection(sock=sock, **kwargs)
+
+    async def create_connection(self, protocol_factory, host: str, port: int, **kwargs):
+        """Как loop.create_connection, но через кеш адресов и с настройкой сокета."""
+        sock = await self.connect(host, port)
+        return await asyncio.get_running_loop().create_connection(protocol_factory, sock=sock, **kwargs)
+
+
+def _from_env() -> Connector:
+    return Connector(
+        dns_ttl=float(os.getenv("MINECHAT_DNS_TTL", DNS_TTL_S)),
+        connect_timeout=float(os.getenv("MINECHAT_CONNECT_TIMEOUT", CONNECT_TIMEOUT_S)),
+        happy_eyeballs_delay=float(os.getenv("MINECHAT_HAPPY_EYEBALLS_DELAY", HAPPY_EYEBALLS_DELAY_S)),
+        keepalive=float(os.getenv("MINECHAT_TCP_KEEPALIVE", 0)),
+        rcvbuf=int(os.getenv("MINECHAT_SOCKET_RCVBUF", 0)),
+        sndbuf=int(os.getenv("MINECHAT_SOCKET_SNDBUF", 0)),
+    )
+
+
+# общий для процесса: кеш адресов переживает переподключения
+connector = _from_env()
+
+
+def add_net_args(parser):
+    """Параметры сетевых соединений (общие для всех скриптов)."""
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=connector.connect_timeout,
+        help="Сколько ждать подключения вместе с резолвом имени, сек, 0 — без ограничения (ENV: MINECHAT_CONNECT_TIMEOUT)",
+    )
+    parser.add_argument(
+        "--dns-ttl",
+        type=float,
+        default=connector.dns_ttl,
+        help="Сколько секунд помнить адреса сервера, не обращаясь к резолверу (ENV: MINECHAT_DNS_TTL)",
+    )
+    parser.add_argument(
+        "--happy-eyeballs-delay",
+        type=float,
+        default=connector.happy_eyeballs_delay,
+        help="Через сколько секунд пробовать следующий адрес (IPv6/IPv4), не дожидаясь предыдущего (ENV: MINECHAT_HAPPY_EYEBALLS_DELAY)",
+    )
+    parser.add_argument(
+        "--tcp-keepalive",
+        type=float,
+        default=connector.keepalive,
+        help="Включить TCP keepalive ядра после N секунд тишины, 0 — выключен (ENV: MINECHAT_TCP_KEEPALIVE)",
+    )
+    parser.add_argument(
+        "--socket-rcvbuf",
+        type=int,
+        default=connector.rcvbuf,
+        help="Размер приёмного буфера сокета, байт, 0 — системный (ENV: MINECHAT_SOCKET_RCVBUF)",
+    )
+    parser.add_argument(
+        "--socket-sndbuf",
+        type=int,
+        default=connector.sndbuf,
+        help="Размер буфера отправки сокета, байт, 0 — системный (ENV: MINECHAT_SOCKET_SNDBUF)",
+    )
+    return parser
+
+
+def configure(args):
+    """Переносит параметры из `add_net_args` в общий `connector`."""
+    connector.connect_timeout = args.connect_timeout
+    connector.dns_ttl = args.dns_ttl
+    connector.happy_eyeballs_delay = args.happy_eyeballs_delay
+    connector.keepalive = args.tcp_keepalive
+    connector.rcvbuf = args.socket_rcvbuf
+    connector.sndbuf = args.socket_sndbuf
+
+
+async def open_connection(host: str, port: int, **kwargs):
+    return await connector.open_connection(host, port, **kwargs)
+
+
+async def create_connection(protocol_factory, host: str, port: int, **kwargs):
+    return await connector.create_connection(protocol_factory, host, port, **kwargs)
@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger("outbox")
+
+COMPACT_AFTER_RECORDS = 1000
+
+
+class Outbox:
+    """
+    Журнал неподтверждённых исходящих сообщений: append-only JSON-lines файл.
+    Сообщение записывается (`add`, получает id) до отправки в сокет и
+    помечается (`ack`), когда сервер ответил на него промптом. После
+    переподключения или перезапуска `pending()` отдаёт неподтверждённые
+    сообщения в исходном порядке для повторной отправки.
+
+    Доставка «хотя бы один раз»: если сервер принял сообщение, но промпт
+    потерялся вместе с соединением, сообщение уйдёт повторно. Повтор
+    отметок (ack уже подтверждённого id) и повторная запись того же id
+    игнорируются.
+
+    Когда подтверждено всё и в файле набралось `compact_after` записей,
+    файл переписывается пустым, чтобы не расти бесконечно.
+
+    Каждая запись доходит до диска (fsync), переписанный файл и каталог —
+    тоже, так что журнал переживает и падение процесса, и отключение
+    питания. Методы блокирующие: из цикла событий их зовут через
+    `asyncio.to_thread`; `add` и `ack` приходят из разных задач,
+    поэтому работа с файлом идёт под блокировкой.
+    """
+
+    def __init__(self, path: str, compact_after: int = COMPACT_AFTER_RECORDS):
+        self.path = path
+        self.compact_after = compact_after
+        self._pending = {}
+        self._next_id = 1
+        self._records = 0
+        self._broken = False
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        self._load()
+        if self._broken or (not self._pending and self._records):
+            # после недописанной строки новые записи склеились бы с ней
+            self._compact()
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._pending:
+            logger.info("outbox: %d unsent messages from the previous session", len(self._pending))
+
+    def _load(self):
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    op, msg_id = record["op"], int(record["id"])
+                except (ValueError, KeyError, TypeError):
+                    # недописанная последняя строка после сбоя
+                    logger.warning("outbox: skipping broken record in %s", self.path)
+                    self._broken = True
+                    continue
+                self._records += 1
+                self._next_id = max(self._next_id, msg_id + 1)
+                if op == "add":
+                    self._pending.setdefault(msg_id, record["text"])
+                elif op == "ack":
+                    self._pending.pop(msg_id, None)
+
+    def _write(self, records):
+        self._file.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._records += len(records)
+
+    def _fsync_dir(self):
+        # без этого переименование может не пережить отключение питания
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _compact(self):
+        if self._file is not None:
+            self._file.close()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for msg_id, text in self._pending.items():
+                f.write(json.dumps({"op": "add", "id": msg_id, "text": text}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._fsync_dir()
+        self._records = len(self._pending)
+        if self._file is not None:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def add(self, messages):
+        """Записывает сообщения без id и присваивает им id."""
+        with self._lock:
+            records = []
+            for message in messages:
+                if message.id is not None:
+                    continue
+                message.id = self._next_id
+                self._next_id += 1
+                self._pending[message.id] = message.text
+                records.append({"op": "add", "id": message.id, "text": message.text, "ts": time.time()})
+            if records:
+                self._write(records)
+
+    def ack(self, ids):
+        with self._lock:
+            records = [{"op": "ack", "id": msg_id} for msg_id in ids if self._pending.pop(msg_id, None) is not None]
+            if records:
+                self._write(records)
+            if not self._pending and self._records >= self.compact_after:
+                self._compact()
+
+    def pending(self) -> list[tuple[int, str]]:
+        with self._lock:
+            return list(self._pending.items())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
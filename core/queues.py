@@ -0,0 +1,157 @@
+import asyncio
+import collections
+import logging
+import threading
+
+
+logger = logging.getLogger("queues")
+
+QUEUE_POLICIES = ("block", "drop_oldest", "coalesce")
+
+# имя очереди -> (размер, политика переполнения)
+DEFAULT_QUEUE_LIMITS = {
+    "sending": (1_000, "block"),
+    "status": (100, "coalesce"),
+}
+
+
+def status_key(item):
+    """Статусы схлопываются по типу и каналу: последнее состояние чтения, отправки, ник."""
+    return type(item), getattr(item, "channel", None)
+
+
+# по какому ключу схлопываются элементы
+COALESCE_KEYS = {
+    "status": status_key,
+}
+STATS_INTERVAL_S = 30.0
+
+
+class BoundedQueue(asyncio.Queue):
+    """
+    asyncio.Queue с ограниченным размером и политикой переполнения:
+      - block       — производитель ждёт (put) или получает QueueFull (put_nowait);
+      - drop_oldest — выбрасывается самый старый элемент, производитель не ждёт никогда;
+      - coalesce    — когда места нет, ещё не прочитанный элемент с тем же ключом
+                      `key(item)` выбрасывается, а новый встаёт в конец; если такого
+                      нет — как drop_oldest. Пока место есть, элементы не схлопываются:
+                      порядок переходов (например, статусов соединения) сохраняется.
+    Счётчики `dropped`, `coalesced` и `blocked` показывают, сколько раз это случалось.
+    """
+
+    def __init__(self, maxsize: int, policy: str = "block", key=type, name: str = ""):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"unknown queue policy: {policy}")
+        super().__init__(maxsize)
+        self.policy = policy
+        self.key = key
+        self.name = name
+        self.dropped = 0
+        self.coalesced = 0
+        self.blocked = 0
+
+    def _remove_pending(self, item) -> bool:
+        key = self.key(item)
+        for i, pending in enumerate(self._queue):
+            if self.key(pending) == key:
+                del self._queue[i]
+                self.coalesced += 1
+                return True
+        return False
+
+    def put_nowait(self, item):
+        if self.policy == "coalesce" and self.full() and self._remove_pending(item):
+            # новое значение встанет в конец, после всего, что пришло раньше него
+            self.task_done()
+        elif self.policy != "block" and self.full():
+            self.get_nowait()
+            self.task_done()
+            self.dropped += 1
+        super().put_nowait(item)
+
+    async def put(self, item):
+        if self.policy != "block":
+            return self.put_nowait(item)
+        if self.full():
+            self.blocked += 1
+        return await super().put(item)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.qsize(),
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "blocked": self.blocked,
+        }
+
+
+class ThreadChannel:
+    """
+    Канал между потоками: `put` из любого потока, `drain` забирает всё
+    накопленное одной пачкой под одной блокировкой. При переполнении
+    выбрасываются самые старые элементы (счётчик `dropped`).
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        with self._lock:
+            self._items.append(item)
+            if self.maxsize and len(self._items) > self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def drain(self) -> list:
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+        return items
+
+
+def parse_queue_limits(specs) -> dict:
+    """
+    Разбирает строки вида `имя=размер[:политика]` поверх значений по умолчанию.
+    Пример: `save=500000:block`.
+    """
+    limits = dict(DEFAULT_QUEUE_LIMITS)
+    for spec in specs or ():
+        for item in spec.split(","):
+            if not item.strip():
+                continue
+            name, _, value = item.strip().partition("=")
+            if name not in limits:
+                raise ValueError(f"unknown queue: {name}")
+            size, _, policy = value.partition(":")
+            policy = policy or limits[name][1]
+            if policy not in QUEUE_POLICIES:
+                raise ValueError(f"unknown queue policy: {policy}")
+            limits[name] = (int(size), policy)
+    return limits
+
+
+def make_queues(limits: dict) -> dict:
+    return {
+        name: BoundedQueue(size, policy, key=COALESCE_KEYS.get(name, type), name=name)
+        for name, (size, policy) in limits.items()
+    }
+
+
+async def report_queue_stats(queues: dict, interval: float = STATS_INTERVAL_S):
+    """Периодически пишет в лог счётчики переполнения, если они изменились."""
+    last = {}
+    while True:
+        await asyncio.sleep(interval)
+        for name, queue in queues.items():
+            stats = queue.stats()
+            counters = (stats["dropped"], stats["coalesced"], stats["blocked"])
+            if counters != last.get(name, (0, 0, 0)):
+                logger.info("queue %s: %s", name, stats)
+                last[name] = counters
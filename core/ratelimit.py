@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+
+SEND_RATE = 5.0
+SEND_BURST = 10
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты «ведро токенов»: в среднем не больше `rate`
+    операций в секунду, подряд — не больше `burst`. `rate` = 0 — без
+    ограничения. Сколько всего пришлось ждать, копится в `waited`.
+    """
+
+    def __init__(self, rate: float = SEND_RATE, burst: int = SEND_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.waited = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, n: int = 1) -> float:
+        """Сколько секунд ждать, пока наберётся `n` токенов; 0 — можно сейчас."""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        return 0.0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+    async def acquire(self, n: int = 1):
+        if not self.rate:
+            return
+        while (wait := self.delay(n)) > 0:
+            self.waited += wait
+            await asyncio.sleep(wait)
+        self.tokens -= n
@@ -2,37 +2,49 @@ import asyncio
 import contextlib
 import logging
 import gui
+from core.linereader import open_line_reader
+from core.messages import parse_batch
 from core.watchdog import WD
 
 logger = logging.getLogger("reader")
 
 
-async def read_msgs(host, port, gui_queue, save_queue, status_queue=None, watchdog_queue=None):
+async def read_msgs(host, port, bus, status_queue=None, liveness=None, replay_filter=None, on_established=None):
     """
     ОДНА сессия чтения. Никаких внутренних переподключений.
     На EOF/ошибке бросает ConnectionError (для внешнего перезапуска).
+    Прочитанные строки публикуются пачками `ChatMessage` (со временем получения
+    из сокета) в шину `bus`, откуда их забирают GUI и история; каждая пачка
+    отмечается в `liveness` для watchdog.
+    Если передан `replay_filter`, повтор старых сообщений после подключения
+    в шину не попадает. `on_established` вызывается, когда соединение открыто.
     """
-    reader = writer = None
+    reader = None
     try:
         if status_queue:
             await status_queue.put(gui.ReadConnectionStateChanged.INITIATED)
 
-        reader, writer = await asyncio.open_connection(host, port)
+        reader = await open_line_reader(host, port)
 
         if status_queue:
             await status_queue.put(gui.ReadConnectionStateChanged.ESTABLISHED)
-        if watchdog_queue:
-            await watchdog_queue.put(WD.READ_OK)
+        if liveness:
+            liveness.touch(WD.READ_OK)
+        if on_established:
+            on_established()
+        if replay_filter is not None:
+            replay_filter.start_replay()
 
         while True:
-            line = await reader.readline()
-            if not line:
+            chunks = await reader.read_timed_batch()
+            if not chunks:
                 raise ConnectionError("server closed read stream")
-            text = line.decode('utf-8', errors='replace').rstrip('\n')
-            await gui_queue.put(text)
-            await save_queue.put(text)
-            if watchdog_queue:
-                await watchdog_queue.put(WD.CHAT_RX)
+            if liveness:
+                liveness.touch(WD.CHAT_RX)
+            for received, lines in chunks:
+                if replay_filter is not None:
+                    lines = [text for text in lines if replay_filter.accept(text)]
+                bus.publish(parse_batch(lines, received))
 
     except asyncio.CancelledError:
         raise
@@ -42,8 +54,8 @@ async def read_msgs(host, port, gui_queue, save_queue, status_queue=None, watchd
     finally:
         if status_queue:
             await status_queue.put(gui.ReadConnectionStateChanged.CLOSED)
-        if writer:
+        if reader:
             with contextlib.suppress(Exception):
-                writer.close()
-                await writer.wait_closed()
+                reader.close()
+                await reader.wait_closed()
 
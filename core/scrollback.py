@@ -0,0 +1,168 @@
+import gzip
+import logging
+import mmap
+import os
+from array import array
+
+from core.history import format_line, strip_ts
+from core.history_db import IndexedHistory, SqliteHistory
+from core.segments import GZ_SUFFIX, SegmentedHistory, closed_segments
+
+
+logger = logging.getLogger("scrollback")
+
+ANCHOR_SLACK = 1000
+
+
+def _same_message(a: str, b: str) -> bool:
+    return strip_ts(a).rstrip() == strip_ts(b).rstrip()
+
+
+class _Segment:
+    """Содержимое сегмента для чтения: mmap обычного файла или распакованный .gz."""
+
+    def __init__(self, path: str, size: int | None = None):
+        self.path = path
+        self.size = size
+        self._buf = None
+
+    def load(self):
+        if self._buf is not None:
+            return self._buf
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            try:
+                with gzip.open(self.path + GZ_SUFFIX, "rb") as gz:
+                    self._buf = gz.read()
+            except FileNotFoundError:
+                self._buf = b""
+            return self._buf
+        with f:
+            size = os.fstat(f.fileno()).st_size if self.size is None else self.size
+            self._buf = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) if size else b""
+        return self._buf
+
+    def close(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._buf = None
+
+
+class TextPager:
+    """
+    Постраничное чтение текстовой истории назад от якорной строки.
+    Сегменты читаются через mmap (сжатые — распаковкой при первом обращении),
+    границы строк складываются в индекс смещений по мере продвижения вглубь,
+    так что повторное чтение уже пройденных строк не сканирует файл заново.
+
+    Номер строки `r` отсчитывается от якоря: 0 — строка непосредственно перед ним.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._segments = []
+        self._seg = array("I")
+        self._starts = array("Q")
+        self._ends = array("Q")
+        self._base = 0
+        self._cur_seg = 0
+        self._cur_end = None
+
+    def _snapshot(self):
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        if os.path.exists(self.path):
+            self._segments.append(_Segment(self.path, os.path.getsize(self.path)))
+        self._segments.extend(_Segment(p) for _, p in reversed(closed_segments(self.path)))
+        self._seg = array("I")
+        self._starts = array("Q")
+        self._ends = array("Q")
+        self._base = 0
+        self._cur_seg = 0
+        self._cur_end = None
+
+    def _discover(self, count: int):
+        """Дополняет индекс смещений, пока в нём не станет `count` строк или не кончится история."""
+        while len(self._starts) < count and self._cur_seg < len(self._segments):
+            buf = self._segments[self._cur_seg].load()
+            if self._cur_end is None:
+                # хвост без перевода строки может быть недописанной строкой — пропускаем
+                self._cur_end = buf.rfind(b"\n")
+            if self._cur_end < 0:
+                self._cur_seg += 1
+                self._cur_end = None
+                continue
+            start = buf.rfind(b"\n", 0, self._cur_end) + 1
+            self._seg.append(self._cur_seg)
+            self._starts.append(start)
+            self._ends.append(self._cur_end)
+            self._cur_end = start - 1
+
+    def _line(self, i: int) -> str:
+        buf = self._segments[self._seg[i]].load()
+        return bytes(buf[self._starts[i]:self._ends[i]]).decode("utf-8", errors="replace").rstrip("\r")
+
+    def anchor(self, text: str, expected: int = 0):
+        """
+        Делает свежий снимок истории и ставит якорь на строку `text`, ближайшую
+        к позиции `expected` от конца. Если строка не найдена — якорь в конце истории.
+        """
+        self._snapshot()
+        self._discover(expected + ANCHOR_SLACK)
+        best = None
+        for i in range(len(self._starts)):
+            if _same_message(self._line(i), text) and (best is None or abs(i - expected) < abs(best - expected)):
+                best = i
+        if best is None:
+            logger.debug("anchor not found, paging from the end of history")
+        self._base = 0 if best is None else best + 1
+
+    def lines(self, first: int, last: int) -> list[str]:
+        """Строки с номерами [first, last) в хронологическом порядке; меньше, если история кончилась."""
+        self._discover(self._base + last)
+        stop = min(self._base + last, len(self._starts))
+        return [self._line(i) for i in range(stop - 1, self._base + first - 1, -1)]
+
+    def close(self):
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+
+
+class SqlitePager:
+    """То же, что `TextPager`, но поверх `SqliteHistory`: якорь — id сообщения."""
+
+    def __init__(self, db):
+        self.db = db
+        self._anchor_id = None
+
+    def anchor(self, text: str, expected: int = 0):
+        rows = self.db.page(None, expected + ANCHOR_SLACK)
+        best = None
+        for i, (_, _, stored) in enumerate(rows):
+            if _same_message(stored, text) and (best is None or abs(i - expected) < abs(best - expected)):
+                best = i
+        if best is not None:
+            self._anchor_id = rows[best][0]
+        else:
+            self._anchor_id = rows[0][0] + 1 if rows else 0
+
+    def lines(self, first: int, last: int) -> list[str]:
+        rows = self.db.page(self._anchor_id, last - first, first)
+        return [format_line(ts, text) for _, ts, text in reversed(rows)]
+
+    def close(self):
+        pass
+
+
+def pager_for(store):
+    """Пейджер для хранилища истории или None, если оно не поддерживает прокрутку."""
+    if isinstance(store, IndexedHistory):
+        store = store.primary
+    if isinstance(store, SegmentedHistory):
+        return TextPager(store.path)
+    if isinstance(store, SqliteHistory):
+        return SqlitePager(store)
+    return None
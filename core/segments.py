@@ -0,0 +1,280 @@
+import concurrent.futures
+import contextlib
+import datetime as dt
+import gzip
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: блокировки нет, файл истории не стоит делить между процессами
+    fcntl = None
+
+from core.history import format_line, tail_lines, tail_lines_forward
+
+
+logger = logging.getLogger("segments")
+
+SEGMENT_TS_FORMAT = "%Y%m%d-%H%M%S"
+GZ_SUFFIX = ".gz"
+LOCK_SUFFIX = ".lock"
+
+
+def compress_segment(path: str) -> str:
+    """
+    Сжимает закрытый сегмент в .gz и удаляет исходник. Выполняется в отдельном процессе.
+    Один сегмент могут сжимать сразу окно и слушатель: у каждого процесса свой
+    временный файл, а уже сжатый кем-то другим сегмент — не ошибка.
+    """
+    target = path + GZ_SUFFIX
+    tmp = f"{target}.{os.getpid()}.part"
+    try:
+        src = open(path, "rb")
+    except FileNotFoundError:
+        return target
+    try:
+        with src, gzip.open(tmp, "wb") as dst:
+            copied = 0
+            # дописанное после закрытия сегмента (старым процессом) не теряем
+            while copied < os.fstat(src.fileno()).st_size:
+                src.seek(copied)
+                shutil.copyfileobj(src, dst, 1 << 20)
+                copied = src.tell()
+        os.replace(tmp, target)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+    return target
+
+
+def _segment_pattern(path: str) -> re.Pattern:
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return re.compile(
+        rf"^{re.escape(stem)}\.(\d{{8}}-\d{{6}})(?:-(\d+))?{re.escape(ext)}(?:{re.escape(GZ_SUFFIX)})?$"
+    )
+
+
+def closed_segments(path: str) -> list[tuple[dt.datetime, str]]:
+    """
+    Закрытые сегменты истории в хронологическом порядке: [(время закрытия, путь)].
+    Путь указывается без .gz; если сегмент уже сжат, его откроет `open_segment`.
+    """
+    directory = os.path.dirname(path) or "."
+    pattern = _segment_pattern(path)
+    found = {}
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    for name in names:
+        m = pattern.match(name)
+        if not m:
+            continue
+        base = name[:-len(GZ_SUFFIX)] if name.endswith(GZ_SUFFIX) else name
+        closed_at = dt.datetime.strptime(m.group(1), SEGMENT_TS_FORMAT)
+        found[base] = (closed_at, int(m.group(2) or 0), os.path.join(directory, base))
+    return [(closed_at, p) for closed_at, _, p in sorted(found.values())]
+
+
+def segment_paths(path: str) -> list[str]:
+    """Все сегменты от старых к новым, последним идёт живой файл."""
+    paths = [p for _, p in closed_segments(path)]
+    if os.path.exists(path):
+        paths.append(path)
+    return paths
+
+
+def open_segment(path: str):
+    """Открывает сегмент на чтение в бинарном режиме — сжатый или обычный."""
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        return gzip.open(path + GZ_SUFFIX, "rb")
+
+
+def iter_history_lines(path: str):
+    """Построчно читает всю историю по всем сегментам, сжатым и живому."""
+    for segment in segment_paths(path):
+        try:
+            with open_segment(segment) as f:
+                for raw in f:
+                    yield raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        except FileNotFoundError:
+            continue
+
+
+class SegmentedHistory:
+    """
+    История, разбитая на сегменты. Живой сегмент лежит по исходному пути;
+    при превышении `max_bytes` или смене суток он переименовывается в
+    `<имя>.<ГГГГММДД-ЧЧММСС>.<расширение>` и сжимается в фоновом процессе.
+    Методы синхронные, из асинхронного кода их вызывают через `asyncio.to_thread`.
+
+    Один путь могут писать сразу окно и слушатель. Запись и ротация идут
+    под блокировкой `<путь>.lock` (fcntl), а перед записью проверяется,
+    что открыт всё ещё живой файл: если другой процесс уже закрыл сегмент,
+    файл открывается заново. Каждая пачка уходит в ОС одной записью —
+    в буфере процесса не остаётся строк, которые попали бы в закрытый сегмент.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0, daily: bool = False, compress: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.daily = daily
+        self.compress = compress
+        self._f = None
+        self._size = 0
+        self._day = None
+        self._executor = None
+        self._lock_fd = None
+
+    def _open_live(self):
+        self._f = open(self.path, "ab", buffering=0)
+        st = os.fstat(self._f.fileno())
+        self._size = st.st_size
+        self._day = dt.date.fromtimestamp(st.st_mtime) if st.st_size else dt.date.today()
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if fcntl is not None:
+            self._lock_fd = os.open(self.path + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+        self._open_live()
+        if self.compress:
+            for _, segment in closed_segments(self.path):
+                if os.path.exists(segment):
+                    self._submit_compression(segment)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        if self._lock_fd is None:
+            yield
+            return
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _follow_live(self):
+        """Если живой файл подменил другой процесс (ротация), переоткрывает его."""
+        fst = os.fstat(self._f.fileno())
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if st is None or (st.st_ino, st.st_dev) != (fst.st_ino, fst.st_dev):
+            self._f.close()
+            self._open_live()
+        else:
+            self._size = fst.st_size
+
+    def write(self, data: str):
+        encoded = data.encode("utf-8")
+        with self._locked():
+            self._follow_live()
+            if self._should_roll(len(encoded)):
+                self.rollover()
+            with memoryview(encoded) as view:
+                while view:
+                    # небуферизованная запись может уйти не целиком
+                    view = view[self._f.write(view):]
+            self._size += len(encoded)
+
+    def append(self, entries):
+        """Дописывает записи `(время, текст)` в формате истории."""
+        self.write("".join(format_line(ts, text) + "\n" for ts, text in entries))
+
+    def flush(self, fsync: bool = False):
+        if self._f is None:
+            return
+        if fsync:
+            os.fsync(self._f.fileno())
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _should_roll(self, incoming: int) -> bool:
+        if not self._size:
+            return False
+        if self.max_bytes and self._size + incoming > self.max_bytes:
+            return True
+        return self.daily and dt.date.today() != self._day
+
+    def _closed_name(self) -> str:
+        stem, ext = os.path.splitext(self.path)
+        stamp = dt.datetime.now().strftime(SEGMENT_TS_FORMAT)
+        candidate = f"{stem}.{stamp}{ext}"
+        n = 0
+        while os.path.exists(candidate) or os.path.exists(candidate + GZ_SUFFIX):
+            n += 1
+            candidate = f"{stem}.{stamp}-{n}{ext}"
+        return candidate
+
+    def rollover(self):
+        """Закрывает живой сегмент, переименовывает его и начинает новый (под блокировкой записи)."""
+        self._f.close()
+        closed = self._closed_name()
+        os.replace(self.path, closed)
+        logger.info("history segment closed: %s", closed)
+        self._open_live()
+        if self.compress:
+            self._submit_compression(closed)
+
+    def _submit_compression(self, segment: str):
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+            )
+        future = self._executor.submit(compress_segment, segment)
+        future.add_done_callback(_log_compression)
+
+    def tail(self, max_lines: int = 0, since: dt.datetime | None = None) -> list[str]:
+        """Последние строки всей истории, с переходом через границы сегментов."""
+        chunks = []
+        total = 0
+        live = [(None, self.path)] if os.path.exists(self.path) else []
+        for closed_at, segment in reversed(closed_segments(self.path) + live):
+            if since is not None and closed_at is not None and closed_at < since:
+                break
+            need = max_lines - total if max_lines else 0
+            try:
+                with open_segment(segment) as f:
+                    if isinstance(f, gzip.GzipFile):
+                        # назад по gzip не перемотать — читаем вперёд, храня только хвост
+                        lines = tail_lines_forward(f, need, since)
+                    else:
+                        lines = tail_lines(f, need, since)
+            except FileNotFoundError:
+                continue
+            chunks.append(lines)
+            total += len(lines)
+            if max_lines and total >= max_lines:
+                break
+        return [line for chunk in reversed(chunks) for line in chunk]
+
+    def iter_lines(self):
+        return iter_history_lines(self.path)
+
+
+def _log_compression(future: concurrent.futures.Future):
+    try:
+        logger.debug("history segment compressed: %s", future.result())
+    except Exception as e:
+        logger.warning("history segment compression failed: %s", e)
@@ -1,103 +1,345 @@
 import asyncio
 import async_timeout
+import collections
 import socket
 import contextlib
-import json
-import os
 import logging
+import time
 import gui
 
-from minechat_api import authorise as mc_authorise, submit_message as mc_submit
+from minechat_api import write_message as mc_write
+from core.auth import Session
+from core.codec import escape_control, readline_text
 from core.exceptions import InvalidToken
+from core.messages import OutgoingMessage
+from core.ratelimit import TokenBucket
 from core.watchdog import WD
 
 
 logger = logging.getLogger("sender")
 
 
-HEARTBEAT_IDLE_S = 5.0
+HEARTBEAT_MIN_S = 5.0
+# меньше порога watchdog чтения (WATCHDOG_TIMEOUT_S × WATCHDOG_ALARM_AFTER): в тихом чате его продлевают только ответы на пинги
+HEARTBEAT_MAX_S = 20.0
 PING_ACK_TIMEOUT_S = 2.0
+SEND_WINDOW = 8
+# переживает экранирование: перевод строки ушёл бы в чат видимым «\n»
+COALESCE_SEPARATOR = " "
 
 
-def _read_token(token_file: str) -> str:
-    path = os.path.expanduser(token_file)
-    if not os.path.exists(path):
-        raise InvalidToken("Токен не найден. Сначала зарегистрируйтесь (register-minechat-user.py).")
-    try:
-        with open(path, encoding="utf-8") as f:
-            return json.load(f).get("account_hash")
-    except Exception as e:
-        raise InvalidToken(f"Не удалось прочитать токен: {e}")
+class SendStats:
+    """
+    Счётчики отправителя: сколько отправлено и подтверждено, задержка
+    подтверждения, время ожидания сообщений в очереди до записи в сокет
+    и сколько сообщений склеено с соседними. `pings_fixed` — сколько пингов
+    отправил бы пульс с постоянным интервалом, для сравнения с `pings`.
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.acked = 0
+        self.pings = 0
+        self.pings_fixed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.dequeued = 0
+        self.coalesced = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+    def on_dequeued(self, messages):
+        now = time.monotonic()
+        for message in messages:
+            delay = now - message.enqueued
+            self.dequeued += 1
+            self.queue_delay_total += delay
+            self.queue_delay_max = max(self.queue_delay_max, delay)
+        self.coalesced += len(messages) - 1
+
+    @property
+    def queue_delay_avg(self) -> float:
+        return self.queue_delay_total / self.dequeued if self.dequeued else 0.0
+
+    def on_ack(self, latency: float):
+        self.acked += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.acked if self.acked else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"sent {self.sent} (pings {self.pings} of {self.pings_fixed} fixed-interval, "
+            f"coalesced {self.coalesced}), acked {self.acked}; "
+            f"ack latency avg {self.latency_avg * 1000:.1f} ms, max {self.latency_max * 1000:.1f} ms; "
+            f"queue delay avg {self.queue_delay_avg * 1000:.1f} ms, max {self.queue_delay_max * 1000:.1f} ms"
+        )
+
+
+class AckWindow:
+    """
+    Отправленные, но ещё не подтверждённые сервером сообщения. Сервер отвечает
+    на каждое сообщение (и пустой пинг) строкой-промптом по порядку, так что
+    достаточно очереди времён отправки: подтверждение снимает самое старое.
+    """
+
+    def __init__(self, size: int, stats: SendStats):
+        self.size = max(1, size)
+        self.stats = stats
+        self.outstanding = collections.deque()
+        self._changed = asyncio.Event()
+
+    def room(self) -> int:
+        return self.size - len(self.outstanding)
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def on_sent(self, ping: bool = False, ids=()):
+        self.outstanding.append((time.monotonic(), ping, ids))
+        self.stats.sent += 1
+        self.stats.pings += ping
+        self._notify()
+
+    def on_ack(self):
+        """Снимает самое старое сообщение; возвращает id из журнала исходящих."""
+        if not self.outstanding:
+            return ()
+        sent_at, _, ids = self.outstanding.popleft()
+        self.stats.on_ack(time.monotonic() - sent_at)
+        self._notify()
+        return ids
+
+    async def changed(self):
+        await self._changed.wait()
+
+
+class Heartbeat:
+    """
+    Адаптивный пульс отправителя. Пинг нужен, только если `interval` секунд
+    не было никакой активности: ни своих отправок, ни подтверждений, ни
+    (через `liveness`) строк в соединении чтения — живой чат сам доказывает,
+    что сервер отвечает. Каждый подтверждённый пинг удваивает интервал до
+    `max_interval`: на стабильном канале пингов всё меньше. Новая сессия
+    начинает снова с `min_interval`.
+
+    Заодно считает в `stats.pings_fixed`, сколько пингов отправил бы
+    пульс с постоянным `min_interval`, который пингует после каждых
+    `min_interval` секунд без отправок.
+    """
+
+    def __init__(self, min_interval: float = HEARTBEAT_MIN_S, max_interval: float = HEARTBEAT_MAX_S,
+                 liveness=None, stats: SendStats | None = None):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+        self.liveness = liveness
+        self.stats = stats
+        self.last_sent = time.monotonic()
+        self._fixed_next = self.last_sent + min_interval
+
+    def _count_fixed(self, now: float):
+        while self._fixed_next <= now:
+            self._fixed_next += self.min_interval
+            if self.stats is not None:
+                self.stats.pings_fixed += 1
+
+    def on_sent(self):
+        """Своя отправка (сообщение или пинг)."""
+        self._count_fixed(time.monotonic())
+        self.last_sent = time.monotonic()
+        self._fixed_next = self.last_sent + self.min_interval
+
+    def on_ping_acked(self):
+        self.interval = min(self.interval * 2, self.max_interval)
+
+    def due_in(self) -> float:
+        """Сколько секунд ещё можно не пинговать; <= 0 — пора."""
+        now = time.monotonic()
+        self._count_fixed(now)
+        last = self.last_sent
+        if self.liveness is not None:
+            last = max(last, self.liveness.last_activity)
+        return last + self.interval - now
 
 
-async def _readline_text(reader: asyncio.StreamReader) -> str:
-    data = await reader.readline()
-    return data.decode("utf-8", errors="replace").rstrip("\n") if data else ""
+async def _read_acks(reader, window: AckWindow, ack_timeout: float, liveness=None, outbox=None,
+                     heartbeat: Heartbeat | None = None):
+    """
+    Снимает подтверждения из окна и отмечает их в журнале исходящих.
+    Каждое сообщение должно быть подтверждено не позже `ack_timeout`
+    после отправки, иначе ConnectionError. Ответ сервера отмечается
+    в `liveness` как доказательство, что сервер жив.
+    """
+    while True:
+        while not window.outstanding:
+            await window.changed()
+        sent_at, ping, _ = window.outstanding[0]
+        try:
+            async with async_timeout.timeout(max(0.0, sent_at + ack_timeout - time.monotonic())):
+                line = await reader.readline()
+        except asyncio.TimeoutError:
+            raise ConnectionError("ping ack timeout" if ping else "no prompt after message")
+        if not line:
+            raise ConnectionError("server closed send stream")
+        ids = window.on_ack()
+        if ping and heartbeat is not None:
+            heartbeat.on_ping_acked()
+        if outbox is not None and ids:
+            await asyncio.to_thread(outbox.ack, ids)
+        if liveness:
+            liveness.touch(WD.SEND_ACK)
+
+
+def _outgoing(item) -> OutgoingMessage:
+    return item if isinstance(item, OutgoingMessage) else OutgoingMessage(item or "")
+
+
+async def _write_messages(writer, sending_queue, window: AckWindow, liveness=None,
+                          limiter: TokenBucket | None = None, coalesce_chars: int = 0,
+                          outbox=None, backlog=(), heartbeat: Heartbeat | None = None):
+    """
+    Пишет сообщения подряд, пока есть место в окне, и сбрасывает их в сокет
+    одним drain: сначала `backlog`, затем из очереди. Короткие сообщения
+    склеиваются до `coalesce_chars`; в простое `heartbeat` шлёт пустой пинг.
+    """
+    heartbeat = heartbeat or Heartbeat(liveness=liveness, stats=window.stats)
+    carry = collections.deque(backlog)
+
+    def next_nowait():
+        return carry.popleft() if carry else sending_queue.get_nowait()
+
+    while True:
+        while not window.room():
+            await window.changed()
+        if carry:
+            item = carry.popleft()
+        else:
+            wait = heartbeat.due_in()
+            if wait <= 0 and window.outstanding:
+                # пинг не нужен, пока ждём подтверждения: за это время оно
+                # придёт (и сдвинет пульс) или _read_acks оборвёт сессию
+                wait = PING_ACK_TIMEOUT_S
+            try:
+                async with async_timeout.timeout(max(0.0, wait)):
+                    item = await sending_queue.get()
+            except asyncio.TimeoutError:
+                # пока ждали, могли прийти строки чата или подтверждения
+                if window.outstanding or heartbeat.due_in() > 0:
+                    continue
+                mc_write(writer, "")
+                window.on_sent(ping=True)
+                heartbeat.on_sent()
+                await writer.drain()
+                if liveness:
+                    liveness.touch(WD.MSG_SENT)
+                continue
+
+        # (текст отправки, исходные сообщения, длина после экранирования);
+        # не больше, чем место в окне
+        groups = []
+        taken = []
+        while True:
+            message = _outgoing(item)
+            message.text = message.text.strip()
+            if message.text:
+                taken.append(message)
+                size = len(escape_control(message.text))
+                if groups and coalesce_chars and (
+                    groups[-1][2] + len(COALESCE_SEPARATOR) + size <= coalesce_chars
+                ):
+                    text, members, total = groups[-1]
+                    groups[-1] = (text + COALESCE_SEPARATOR + message.text, members + [message],
+                                  total + len(COALESCE_SEPARATOR) + size)
+                elif len(groups) < window.room():
+                    groups.append((message.text, [message], size))
+                else:
+                    carry.appendleft(message)
+                    break
+            try:
+                item = next_nowait()
+            except asyncio.QueueEmpty:
+                break
+
+        if outbox is not None:
+            # отложенное до следующего круга тоже записываем сразу
+            await asyncio.to_thread(outbox.add, taken)
+        for i, (text, members, _) in enumerate(groups):
+            if limiter is not None:
+                if i and limiter.delay():
+                    # уже записанное не держим в буфере, пока ждём токен
+                    await writer.drain()
+                await limiter.acquire()
+            window.stats.on_dequeued(members)
+            mc_write(writer, text)
+            window.on_sent(ids=tuple(m.id for m in members if m.id is not None))
+        if not groups:
+            continue
+        heartbeat.on_sent()
+        await writer.drain()
+        if liveness:
+            liveness.touch(WD.MSG_SENT)
 
 
-async def send_msgs(host, port, sending_queue, token_file, status_queue=None, watchdog_queue=None):
+async def send_msgs(session: Session, sending_queue, *, status_queue=None, liveness=None,
+                    ack_liveness=None, on_established=None, window=SEND_WINDOW, stats=None,
+                    limiter=None, coalesce_chars=0, outbox=None,
+                    heartbeat_min=HEARTBEAT_MIN_S, heartbeat_max=HEARTBEAT_MAX_S):
     """
-    ОДНА сессия «отправителя»: авторизуется, затем либо отправляет пользовательские
-    сообщения, либо регулярно шлёт пустой пинг и ждёт ПРОМПТ от сервера.
-    На сетевых сбоях/таймаутах поднимает ConnectionError.
+    ОДНА сессия «отправителя»: авторизуется через `session` и шлёт сообщения
+    конвейером до `window` неподтверждённых, в простое — пинги (`Heartbeat`).
+    Сначала повторяет неподтверждённое из `outbox`. На сбоях/таймаутах
+    поднимает ConnectionError; ответы сервера отмечаются в `ack_liveness`.
     """
-    token = _read_token(token_file)
+    stats = stats or SendStats()
+    session.load_token()  # нет токена — InvalidToken ещё до подключения
     reader = writer = None
     try:
         if status_queue:
             await status_queue.put(gui.SendingConnectionStateChanged.INITIATED)
 
-        reader, writer = await asyncio.open_connection(host, port)
-        ok = await mc_authorise(reader, writer, token)
-        if not ok:
-            if status_queue:
-                await status_queue.put(gui.SendingConnectionStateChanged.CLOSED)
-            raise InvalidToken("Неизвестный токен. Проверьте его или зарегистрируйте заново.")
+        reader, writer = await session.open(status_queue, liveness)
 
         if status_queue:
             await status_queue.put(gui.SendingConnectionStateChanged.ESTABLISHED)
-        if watchdog_queue:
-            await watchdog_queue.put(WD.SEND_OK)
+        if liveness:
+            liveness.touch(WD.SEND_OK)
+        if on_established:
+            on_established()
 
         try:
             async with async_timeout.timeout(PING_ACK_TIMEOUT_S):
-                _ = await _readline_text(reader)
+                _ = await readline_text(reader)
         except asyncio.TimeoutError:
             raise ConnectionError("no initial prompt after auth")
 
-        while True:
-            try:
-                async with async_timeout.timeout(HEARTBEAT_IDLE_S) as cm:
-                    text = await sending_queue.get()
-            except asyncio.TimeoutError:
-                await mc_submit(writer, "")
-                if watchdog_queue:
-                    await watchdog_queue.put(WD.MSG_SENT)
-
-                try:
-                    async with async_timeout.timeout(PING_ACK_TIMEOUT_S):
-                        _ = await _readline_text(reader)
-                    if watchdog_queue:
-                        await watchdog_queue.put(WD.CHAT_RX)
-                except asyncio.TimeoutError:
-                    raise ConnectionError("ping ack timeout")
-                continue
-
-            text = (text or "").strip()
-            if not text:
-                continue
-
-            await mc_submit(writer, text)
-            if watchdog_queue:
-                await watchdog_queue.put(WD.MSG_SENT)
-
-            try:
-                async with async_timeout.timeout(PING_ACK_TIMEOUT_S):
-                    _ = await _readline_text(reader)
-                if watchdog_queue:
-                    await watchdog_queue.put(WD.CHAT_RX)
-            except asyncio.TimeoutError:
-                raise ConnectionError("no prompt after message")
+        acks = AckWindow(window, stats)
+        heartbeat = Heartbeat(heartbeat_min, heartbeat_max, liveness, stats)
+        backlog = []
+        if outbox is not None:
+            backlog = [OutgoingMessage(text, id=msg_id) for msg_id, text in outbox.pending()]
+            if backlog:
+                logger.info("resending %d unacknowledged messages", len(backlog))
+        tasks = [
+            asyncio.create_task(_read_acks(reader, acks, PING_ACK_TIMEOUT_S, ack_liveness or liveness, outbox, heartbeat)),
+            asyncio.create_task(_write_messages(
+                writer, sending_queue, acks, liveness, limiter, coalesce_chars, outbox, backlog, heartbeat,
+            )),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if stats.acked:
+                logger.debug("send session: %s", stats.summary())
 
     except asyncio.CancelledError:
         if status_queue:
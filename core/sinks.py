@@ -0,0 +1,208 @@
+import abc
+import asyncio
+import collections
+import datetime as dt
+import json
+import logging
+import sys
+
+import async_timeout
+
+from core.history import format_line
+from core.segments import SegmentedHistory
+
+
+logger = logging.getLogger("sinks")
+
+
+class Sink(abc.ABC):
+    """
+    Приёмник строк со своей очередью, буфером и политикой сброса.
+    `publish` никогда не блокирует: при переполнении выбрасывается самая
+    старая запись, а счётчик `dropped` растёт. Наследник обязан
+    реализовать `write_batch`, остальные шаги по умолчанию ничего не делают.
+    """
+
+    name = "sink"
+
+    def __init__(self, max_pending: int = 10_000, flush_lines: int = 100, flush_interval: float = 1.0):
+        self.max_pending = max_pending
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._pending = collections.deque()
+        self._ready = asyncio.Event()
+
+    def publish(self, record) -> None:
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self._pending.append(record)
+        self._ready.set()
+
+    def publish_many(self, records) -> None:
+        self._pending.extend(records)
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            for _ in range(overflow):
+                self._pending.popleft()
+            self.dropped += overflow
+        self._ready.set()
+
+    def _take_all(self) -> list:
+        batch = list(self._pending)
+        self._pending.clear()
+        self._ready.clear()
+        return batch
+
+    async def open(self):
+        pass
+
+    @abc.abstractmethod
+    async def write_batch(self, records: list):
+        ...
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def run(self):
+        """Цикл записи: ждёт данные, пишет пачками, сбрасывает по порогам."""
+        loop = asyncio.get_running_loop()
+        await self.open()
+        unflushed = 0
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                try:
+                    async with async_timeout.timeout(timeout):
+                        await self._ready.wait()
+                except asyncio.TimeoutError:
+                    await self.flush()
+                    unflushed, deadline = 0, None
+                    continue
+
+                batch = self._take_all()
+                await self.write_batch(batch)
+                unflushed += len(batch)
+                if deadline is None:
+                    deadline = loop.time() + self.flush_interval
+                if unflushed >= self.flush_lines:
+                    await self.flush()
+                    unflushed, deadline = 0, None
+        except Exception:
+            # задачу приёмника ждут только при выходе — сообщаем о сбое сразу
+            logger.exception("%s: ошибка записи, приёмник остановлен", self.name)
+            raise
+        finally:
+            rest = self._take_all()
+            if rest:
+                await self.write_batch(rest)
+            await self.flush()
+            await self.close()
+            if self.dropped:
+                logger.warning("%s: отброшено %d строк из-за переполнения", self.name, self.dropped)
+
+
+class FileSink(Sink):
+    """
+    Файл истории, открытый один раз на всё время работы. Запись идёт через
+    `SegmentedHistory`, так что ротация и сжатие сегментов работают и здесь.
+    """
+
+    name = "history"
+
+    def __init__(self, path: str, max_bytes: int = 0, daily: bool = False, compress: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.store = SegmentedHistory(path, max_bytes=max_bytes, daily=daily, compress=compress)
+
+    def format(self, record) -> str:
+        return format_line(*record) + "\n"
+
+    async def open(self):
+        await asyncio.to_thread(self.store.open)
+
+    async def write_batch(self, records: list):
+        await asyncio.to_thread(self.store.write, "".join(self.format(r) for r in records))
+
+    async def flush(self):
+        await asyncio.to_thread(self.store.flush)
+
+    async def close(self):
+        await asyncio.to_thread(self.store.close)
+
+
+class JsonLinesSink(FileSink):
+    """JSON-lines для внешних инструментов: {"ts": ISO-время, "text": строка}."""
+
+    name = "jsonl"
+
+    def format(self, record) -> str:
+        ts, text = record
+        return json.dumps({"ts": ts.isoformat(timespec="seconds"), "text": text.rstrip()}, ensure_ascii=False) + "\n"
+
+
+class StdoutSink(Sink):
+    """Вывод в консоль: запись идёт в отдельном потоке, цикл событий не ждёт терминал."""
+
+    name = "stdout"
+
+    def __init__(self, stream=None, flush_lines: int = 1, flush_interval: float = 0.1, **kwargs):
+        super().__init__(flush_lines=flush_lines, flush_interval=flush_interval, **kwargs)
+        self.stream = stream or sys.stdout
+
+    async def write_batch(self, records: list):
+        data = "".join(format_line(ts, text) + "\n" for ts, text in records)
+        await asyncio.to_thread(self.stream.write, data)
+
+    async def flush(self):
+        await asyncio.to_thread(self.stream.flush)
+
+
+class SinkPipeline:
+    """
+    Раздаёт каждую строку во все приёмники. Таймстемп ставится один раз
+    в момент получения, каждый приёмник пишет в своём темпе.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self._tasks = []
+
+    def publish(self, text: str) -> None:
+        record = (dt.datetime.now(), text)
+        for sink in self.sinks:
+            sink.publish(record)
+
+    def publish_many(self, texts) -> None:
+        """Пачка строк, прочитанных за один раз, с общим временем получения."""
+        now = dt.datetime.now()
+        records = [(now, text) for text in texts]
+        for sink in self.sinks:
+            sink.publish_many(records)
+
+    async def __aenter__(self):
+        self._tasks = [asyncio.create_task(sink.run(), name=f"sink:{sink.name}") for sink in self.sinks]
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """
+        Останавливает приёмники. Их сбои поднимаются как ExceptionGroup,
+        если блок завершился без исключения, иначе только пишутся в лог,
+        чтобы не заслонить исходную ошибку.
+        """
+        for task in self._tasks:
+            task.cancel()
+        results = await asyncio.gather(*self._tasks, return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        self._tasks = []
+        if not errors:
+            return
+        if exc is None:
+            raise ExceptionGroup("sink failures", errors)
+        for error in errors:
+            logger.error("sink failed: %r", error)
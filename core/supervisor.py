@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from enum import Enum
+
+import gui
+from core.backoff import Backoff, STABLE_AFTER_S
+
+
+logger = logging.getLogger("supervisor")
+
+COUNTDOWN_STEP_S = 1.0
+
+
+class ChannelState(str, Enum):
+    STARTING = "starting"
+    RUNNING = "running"
+    BACKOFF = "backoff"
+
+    def __str__(self) -> str:
+        return str(self.value)
+
+
+class ChannelSupervisor:
+    """
+    Перезапускает один канал (чтение или отправку) независимо от другого.
+    `run_channel(established)` — корутина-функция одной сессии канала: она
+    вызывает `established()`, когда соединение открыто, и на сбое
+    поднимает ConnectionError (в том числе внутри ExceptionGroup из
+    TaskGroup). Остальные исключения (например, InvalidToken) не
+    перехватываются и завершают супервизор.
+
+    Паузу перед перезапуском задаёт `backoff` (экспоненциальный рост с
+    джиттером и размыкатель); сессия, проработавшая после подключения
+    `stable_after` секунд, считается здоровой, и счёт сбоев начинается заново. Пока идёт пауза,
+    в `status_queue` раз в секунду уходит `gui.ReconnectScheduled` с
+    оставшимся временем.
+    """
+
+    def __init__(self, name: str, run_channel, backoff: Backoff | None = None,
+                 status_queue=None, stable_after: float = STABLE_AFTER_S):
+        self.name = name
+        self.run_channel = run_channel
+        self.backoff = backoff or Backoff()
+        self.status_queue = status_queue
+        self.stable_after = stable_after
+        self.state = ChannelState.STARTING
+        self.restarts = 0
+        self.last_error = None
+        self._established_at = None
+
+    def established(self):
+        """Канал подключился: с этого момента он RUNNING."""
+        self.state = ChannelState.RUNNING
+        self._established_at = time.monotonic()
+
+    async def run(self):
+        while True:
+            self.state = ChannelState.STARTING
+            self._established_at = None
+            error = None
+            try:
+                await self.run_channel(self.established)
+                error = ConnectionError("channel stopped")
+            except* ConnectionError as eg:
+                error = eg
+                while isinstance(error, BaseExceptionGroup):
+                    error = error.exceptions[0]
+
+            if self._established_at is not None and time.monotonic() - self._established_at >= self.stable_after:
+                self.backoff.reset()
+            delay = self.backoff.failure()
+            self.restarts += 1
+            self.last_error = error
+            self.state = ChannelState.BACKOFF
+            logger.info("%s channel failed (%s), restart #%d in %.1fs", self.name, error, self.restarts, delay)
+            await self._wait(delay)
+
+    async def _wait(self, delay: float):
+        deadline = time.monotonic() + delay
+        while (left := deadline - time.monotonic()) > 0:
+            if self.status_queue is not None:
+                await self.status_queue.put(gui.ReconnectScheduled(self.name, left, self.backoff.breaker_open))
+            await asyncio.sleep(min(COUNTDOWN_STEP_S, left))
+
+    def stats(self) -> str:
+        return (f"state {self.state}, restarts {self.restarts}, failures in a row {self.backoff.failures}, "
+                f"last error {self.last_error}")
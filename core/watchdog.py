@@ -1,11 +1,16 @@
 import asyncio
+import collections
 import logging
 import time
 from enum import Enum
-import async_timeout
 
 watchdog_logger = logging.getLogger("watchdog")
 
+SUMMARY_INTERVAL_S = 10.0
+# канал чтения переподключается после WATCHDOG_ALARM_AFTER таймаутов подряд (5 × 5 с тишины)
+WATCHDOG_TIMEOUT_S = 5.0
+WATCHDOG_ALARM_AFTER = 5
+
 
 class WD(str, Enum):
     PROMPT = "Prompt before auth"
@@ -14,35 +19,77 @@ class WD(str, Enum):
     MSG_SENT = "Message sent"
     READ_OK = "Read connection established"
     SEND_OK = "Send connection established"
+    SEND_ACK = "Server acknowledged a message or ping"
 
     def __str__(self) -> str:
         return str(self.value)
 
 
-async def watch_for_connection(queue: asyncio.Queue, timeout_s: float = 1.0, alarm_after: int = 1):
+class Liveness:
+    """
+    Отметка последней активности соединения. Производители (чтение, отправка,
+    авторизация) вызывают `touch` — это запись времени и счётчика, без очереди
+    и без логирования; watchdog сам решает, когда проверить и что записать в лог.
+    Если задан `parent`, каждое событие отмечается и в нём: так у канала
+    чтения свой watchdog, а общая отметка видит активность обоих каналов.
+    """
+
+    def __init__(self, parent: "Liveness | None" = None):
+        self.parent = parent
+        self.last_activity = time.monotonic()
+        self.counts = collections.Counter()
+
+    def touch(self, event: WD):
+        self.last_activity = time.monotonic()
+        self.counts[event] += 1
+        if self.parent is not None:
+            self.parent.touch(event)
+
+    def reset(self):
+        self.last_activity = time.monotonic()
+
+    def take_counts(self) -> collections.Counter:
+        counts, self.counts = self.counts, collections.Counter()
+        return counts
+
+
+def _log_summary(liveness: Liveness, period_s: float):
+    counts = liveness.take_counts()
+    if not counts:
+        return
+    sources = ", ".join(f"{event.value}: {n}" for event, n in counts.most_common())
+    watchdog_logger.info("[%d] Connection is alive (%ds). Sources: %s", int(time.time()), round(period_s), sources)
+
+
+async def watch_for_connection(liveness: Liveness, timeout_s: float = 1.0, alarm_after: int = 1,
+                               summary_interval: float = SUMMARY_INTERVAL_S):
     """
-    Пишет событие при любой активности. Если подряд произошло `alarm_after`
-    таймаутов ожидания события длительностью `timeout_s`, логирует таймаут
-    и поднимает ConnectionError, чтобы перезапустить соединение.
+    Спит до ближайшего дедлайна: `timeout_s` после последней активности.
+    Если за это время `liveness` не обновился, логирует таймаут; после
+    `alarm_after` таймаутов подряд поднимает ConnectionError, чтобы
+    перезапустить соединение. Активность логируется сводкой не чаще раза
+    в `summary_interval` секунд.
     """
+    liveness.reset()
     misses = 0
+    period_start = time.monotonic()
+    summary_at = period_start + summary_interval
+    last_summary = period_start
     while True:
-        try:
-            async with async_timeout.timeout(timeout_s) as cm:
-                event = await queue.get()
+        now = time.monotonic()
+        if now >= summary_at:
+            _log_summary(liveness, now - last_summary)
+            last_summary, summary_at = now, now + summary_interval
+        if liveness.last_activity > period_start:
             misses = 0
-            ts = int(time.time())
-            msg = event.value if isinstance(event, WD) else str(event)
-            watchdog_logger.info(f"[{ts}] Connection is alive. Source: {msg}")
-        except asyncio.CancelledError:
-            raise
-        
-        except asyncio.TimeoutError:
-            if cm.expired:
-                misses += 1
-                ts = int(time.time())
-                watchdog_logger.info(f"[{ts}] {int(timeout_s)}s timeout is elapsed")
-                if misses >= alarm_after:
-                    raise ConnectionError("watchdog timeout")
-            else:
-                raise
+        deadline = max(liveness.last_activity, period_start) + timeout_s
+        if now < deadline:
+            await asyncio.sleep(min(deadline, summary_at) - now)
+            continue
+
+        misses += 1
+        watchdog_logger.info(f"[{int(time.time())}] {int(timeout_s)}s timeout is elapsed")
+        if misses >= alarm_after:
+            _log_summary(liveness, now - last_summary)
+            raise ConnectionError("watchdog timeout")
+        period_start = now
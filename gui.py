@@ -1,8 +1,35 @@
 import anyio
 import tkinter as tk
+import _tkinter
 import asyncio
+import logging
+import math
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from tkinter.scrolledtext import ScrolledText
 from enum import Enum
+from tkinter import messagebox
+
+from core.codec import unescape_control
+from core.messages import OutgoingMessage
+from core.queues import ThreadChannel
+
+logger = logging.getLogger("gui")
+
+
+MAX_PANEL_LINES = 1000
+PAGE_LINES = 200
+TAIL_WINDOWS = 4
+TK_MIN_INTERVAL = 1 / 120
+TK_MAX_INTERVAL = 0.1
+FRAME_INTERVAL = 1 / 60
+# сколько неразобранных пачек может ждать поток Tk, прежде чем перестанем забирать новые
+INBOX_MAX_BATCHES = 16
+# сбои чтения истории: битый или обрезанный архив (gzip.BadGzipFile — это OSError), файл или база недоступны
+PAGER_ERRORS = (OSError, EOFError, zlib.error, sqlite3.Error)
 
 
 class TkAppClosed(Exception):
@@ -32,78 +59,363 @@ class NicknameReceived:
         self.nickname = nickname
 
 
-def process_new_message(input_field, sending_queue):
+class ReconnectScheduled:
+    """Канал `channel` ('read' или 'send') переподключится через `delay` секунд."""
+
+    def __init__(self, channel, delay, breaker_open=False):
+        self.channel = channel
+        self.delay = delay
+        self.breaker_open = breaker_open
+
+
+STATE_COLORS = {'INITIATED': 'orange', 'ESTABLISHED': 'green', 'CLOSED': 'red'}
+
+
+def offer(queue, item):
+    """put_nowait, который вместо QueueFull возвращает False."""
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        return False
+    return True
+
+
+def process_new_message(input_field, submit):
     text = input_field.get()
-    sending_queue.put_nowait(text)
+    if not submit(text):
+        # очередь отправки переполнена — оставляем текст в поле, можно повторить
+        return
     input_field.delete(0, tk.END)
 
 
-async def update_tk(root_frame, interval=1 / 120):
+def restore_input(input_field, text):
+    """Возвращает в поле ввода текст, который не удалось поставить в очередь отправки."""
+    current = input_field.get()
+    input_field.delete(0, tk.END)
+    input_field.insert(0, f"{text} {current}" if current else text)
+
+
+def pump_tk_events(root_frame):
+    """Обрабатывает все накопившиеся события Tk и возвращает их количество."""
+    processed = 0
+    while root_frame.tk.dooneevent(_tkinter.ALL_EVENTS | _tkinter.DONT_WAIT):
+        processed += 1
+    if not root_frame.winfo_exists():
+        raise tk.TclError('application has been destroyed')
+    return processed
+
+
+async def update_tk(root_frame, wake=None, min_interval=TK_MIN_INTERVAL, max_interval=TK_MAX_INTERVAL):
+    """
+    Адаптивная прокачка событий Tk: пока есть ввод или отрисовка, опрашивает
+    с частотой `min_interval`, в простое удваивает паузу до `max_interval`.
+    Задачи, которые что-то поменяли в окне, будят цикл через событие `wake`.
+    """
+    wake = wake or asyncio.Event()
+    interval = min_interval
     while True:
         try:
-            root_frame.update()
+            processed = pump_tk_events(root_frame)
         except tk.TclError:
             # if application has been destroyed/closed
             raise TkAppClosed()
-        await asyncio.sleep(interval)
+        interval = min_interval if processed else min(interval * 2, max_interval)
+        wake.clear()
+        try:
+            await asyncio.wait_for(wake.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+class ConversationView:
+    """
+    Виртуализированная лента сообщений. В виджете держится окно не больше
+    `max_lines` строк; сообщения за сессию (`ChatMessage`) и строки,
+    подгруженные при старте, лежат в памяти в `tail`, более старые читаются
+    из истории через `pager`, когда пользователь докручивает до верха окна.
+
+    Позиции строк: 0..len(tail)-1 — строки в памяти, отрицательные — история
+    перед ними (-1 — последняя строка перед tail[0]). В виджете показаны
+    позиции [start, end); если end == len(tail), лента следит за новыми сообщениями.
+    """
+
+    def __init__(self, panel, pager=None, max_lines=MAX_PANEL_LINES, page_lines=PAGE_LINES):
+        self.panel = panel
+        self.pager = pager
+        self.max_lines = max_lines
+        self.page_lines = page_lines
+        self.tail_cap = max_lines * TAIL_WINDOWS
+        self.tail = []
+        self.start = 0
+        self.end = 0
+        self.history_exhausted = pager is None
+        self._anchored = False
+
+    @property
+    def following(self):
+        return self.end == len(self.tail)
+
+    def _top_line(self):
+        return int(self.panel.index('@0,0').split('.')[0])
+
+    def _insert_bottom(self, lines):
+        text = '\n'.join(map(str, lines))
+        if self.end > self.start:
+            text = '\n' + text
+        self.panel.insert('end', text)
+        self.end += len(lines)
+
+    def _insert_top(self, lines):
+        text = '\n'.join(map(str, lines))
+        if self.end > self.start:
+            text += '\n'
+        self.panel.insert('1.0', text)
+        self.start -= len(lines)
+
+    def _delete_top(self, count):
+        self.panel.delete('1.0', f'{count + 1}.0')
+        self.start = min(self.start + count, self.end)
+
+    def _delete_bottom(self, count):
+        shown = self.end - self.start
+        if count >= shown:
+            self.panel.delete('1.0', 'end')
+            self.end = self.start
+            return
+        self.panel.delete(f'{shown - count}.end', 'end')
+        self.end -= count
+
+    def _overflow(self):
+        return max(0, self.end - self.start - self.max_lines) if self.max_lines else 0
+
+    def add_live(self, messages):
+        """Новые сообщения: дописываются в виджет, только если лента следит за концом."""
+        was_following = self.following
+        self.tail.extend(messages)
+        if was_following:
+            stick = self.panel.yview()[1] >= 1.0
+            top = self._top_line()
+            self.panel['state'] = 'normal'
+            if self.max_lines and len(messages) > self.max_lines:
+                # пачка больше окна — показываем только её конец
+                self.panel.delete('1.0', 'end')
+                self.start = self.end = len(self.tail) - self.max_lines
+                messages = messages[-self.max_lines:]
+            self._insert_bottom(messages)
+            trimmed = self._overflow()
+            if trimmed:
+                self._delete_top(trimmed)
+            self.panel['state'] = 'disabled'
+            if stick:
+                self.panel.yview(tk.END)
+            else:
+                # пользователь читает историю — не дёргаем промотку
+                self.panel.yview(f'{max(top - trimmed, 1)}.0')
+        self._trim_tail()
+
+    def _trim_tail(self):
+        """Забывает строки в памяти, которые уже ушли из окна: они есть в истории."""
+        if not self.tail_cap or len(self.tail) <= self.tail_cap or self.start <= 0:
+            return
+        drop = min(self.start, len(self.tail) - self.tail_cap)
+        del self.tail[:drop]
+        self.start -= drop
+        self.end -= drop
+        self._anchored = False
+        self.history_exhausted = self.pager is None
+
+    def wants(self):
+        """Что подгрузить по положению прокрутки: 'older', 'newer' или None."""
+        first, last = self.panel.yview()
+        if first <= 0.0 and (self.start > 0 or not self.history_exhausted):
+            return 'older'
+        if last >= 1.0 and not self.following:
+            return 'newer'
+        return None
+
+    def range_for(self, direction):
+        if direction == 'older':
+            return self.start - self.page_lines, self.start
+        return self.end, min(self.end + self.page_lines, len(self.tail))
+
+    def fetch(self, a, b):
+        """
+        Строки позиций [a, b). Может читать историю с диска — вызывать вне цикла Tk.
+        Если история не читается, отдаёт только строки из памяти и больше её не листает.
+        """
+        lines = []
+        if a < 0 and self.pager is not None:
+            try:
+                if not self._anchored:
+                    self.pager.anchor(str(self.tail[0]) if self.tail else '', len(self.tail))
+                    self._anchored = True
+                lines = self.pager.lines(-min(b, 0), -a)
+            except PAGER_ERRORS:
+                # битая история не должна ронять окно: показываем то, что есть в памяти
+                logger.exception("history read failed, scrollback stops here")
+                self.history_exhausted = True
+        if b > 0:
+            lines += self.tail[max(a, 0):b]
+        return lines
+
+    def apply(self, direction, lines, requested):
+        """Вставляет подгруженные строки, сохраняя то, что пользователь видит на экране."""
+        if direction == 'older' and len(lines) < requested:
+            self.history_exhausted = True
+        if not lines:
+            return
+        top = self._top_line()
+        self.panel['state'] = 'normal'
+        if direction == 'older':
+            self._insert_top(lines)
+            top += len(lines)
+            overflow = self._overflow()
+            if overflow:
+                self._delete_bottom(overflow)
+        else:
+            self._insert_bottom(lines)
+            overflow = self._overflow()
+            if overflow:
+                self._delete_top(overflow)
+                top -= overflow
+        self.panel['state'] = 'disabled'
+        self.panel.yview(f'{max(top, 1)}.0')
+
+
+def drain_queue(queue, first=None):
+    """Забирает из очереди всё, что уже в ней лежит."""
+    items = [] if first is None else [first]
+    while True:
+        try:
+            items.append(queue.get_nowait())
+        except asyncio.QueueEmpty:
+            return items
 
 
-async def update_conversation_history(panel, messages_queue):
+async def update_conversation_history(panel, feed, max_lines=MAX_PANEL_LINES, pager=None,
+                                      wake=None, frame_interval=FRAME_INTERVAL, scroll_poll_interval=0.1):
+    """Показывает сообщения из подписки `feed` на шину чата."""
+    wake = wake or asyncio.Event()
+    view = ConversationView(panel, pager, max_lines)
     while True:
-        msg = await messages_queue.get()
         try:
-            panel['state'] = 'normal'
-            if panel.index('end-1c') != '1.0':
-                panel.insert('end', '\n')
-            panel.insert('end', msg)
-            # TODO сделать промотку умной, чтобы не мешала просматривать историю сообщений
-            # ScrolledText.frame
-            # ScrolledText.vbar
-            panel.yview(tk.END)
-            panel['state'] = 'disabled'
-
+            batch = await asyncio.wait_for(feed.get_batch(), scroll_poll_interval)
+        except asyncio.TimeoutError:
+            batch = []
+        try:
+            if batch:
+                view.add_live(batch)
+                wake.set()
+            direction = view.wants()
         except tk.TclError:
             raise TkAppClosed()
 
+        if direction:
+            a, b = view.range_for(direction)
+            lines = await asyncio.to_thread(view.fetch, a, b)
+            try:
+                view.apply(direction, lines, b - a)
+            except tk.TclError:
+                raise TkAppClosed()
+            wake.set()
+        # копим сообщения до следующего кадра, чтобы вставлять их пачкой
+        await asyncio.sleep(frame_interval)
+
+
+def reset_status(status_labels):
+    nickname_label, read_label, write_label = status_labels
+    nickname_label['text'] = 'Имя пользователя: неизвестно'
+    read_label['text'] = 'Чтение: нет соединения'
+    read_label['fg'] = 'grey'
+    write_label['text'] = 'Отправка: нет соединения'
+    write_label['fg'] = 'grey'
+
 
-async def update_status_panel(status_labels, status_updates_queue):
+def apply_status(status_labels, msg):
+    """Обновляет панель статуса по одному сообщению из очереди статусов."""
     nickname_label, read_label, write_label = status_labels
+    if isinstance(msg, ReadConnectionStateChanged):
+        read_label['text'] = f'Чтение: {msg}'
+        read_label['fg'] = STATE_COLORS[msg.name]
 
-    def set_read(state_text, color='grey'):
-        read_label['text'] = f'Чтение: {state_text}'
-        read_label['fg'] = color
+    elif isinstance(msg, SendingConnectionStateChanged):
+        write_label['text'] = f'Отправка: {msg}'
+        write_label['fg'] = STATE_COLORS[msg.name]
 
-    def set_write(state_text, color='grey'):
-        write_label['text'] = f'Отправка: {state_text}'
-        write_label['fg'] = color
+    elif isinstance(msg, NicknameReceived):
+        nickname_label['text'] = f'Имя пользователя: {msg.nickname}'
 
-    nickname_label['text'] = 'Имя пользователя: неизвестно'
-    set_read('нет соединения', 'grey')
-    set_write('нет соединения', 'grey')
+    elif isinstance(msg, ReconnectScheduled):
+        label, title = (read_label, 'Чтение') if msg.channel == 'read' else (write_label, 'Отправка')
+        note = ', сервер недоступен' if msg.breaker_open else ''
+        label['text'] = f'{title}: повтор через {math.ceil(msg.delay)} с{note}'
+        label['fg'] = 'red' if msg.breaker_open else 'orange'
+
+
+async def update_status_panel(status_labels, status_updates_queue, wake=None):
+    wake = wake or asyncio.Event()
+    reset_status(status_labels)
 
     while True:
         msg = await status_updates_queue.get()
         try:
-            if isinstance(msg, ReadConnectionStateChanged):
-                if msg is ReadConnectionStateChanged.INITIATED:
-                    set_read(str(msg), 'orange')
-                elif msg is ReadConnectionStateChanged.ESTABLISHED:
-                    set_read(str(msg), 'green')
-                elif msg is ReadConnectionStateChanged.CLOSED:
-                    set_read(str(msg), 'red')
-
-            elif isinstance(msg, SendingConnectionStateChanged):
-                if msg is SendingConnectionStateChanged.INITIATED:
-                    set_write(str(msg), 'orange')
-                elif msg is SendingConnectionStateChanged.ESTABLISHED:
-                    set_write(str(msg), 'green')
-                elif msg is SendingConnectionStateChanged.CLOSED:
-                    set_write(str(msg), 'red')
-
-            elif isinstance(msg, NicknameReceived):
-                nickname_label['text'] = f'Имя пользователя: {msg.nickname}'
+            apply_status(status_labels, msg)
         except tk.TclError:
             raise TkAppClosed()
+        wake.set()
+
+
+def create_search_panel(root_frame, on_search):
+    search_frame = tk.Frame(root_frame)
+    search_frame.pack(side="top", fill=tk.X)
+
+    search_field = tk.Entry(search_frame)
+    search_field.pack(side="left", fill=tk.X, expand=True)
+    search_field.bind("<Return>", lambda event: on_search(search_field.get()))
+
+    search_button = tk.Button(search_frame)
+    search_button["text"] = "Найти"
+    search_button["command"] = lambda: on_search(search_field.get())
+    search_button.pack(side="left")
+
+    return search_frame
+
+
+def show_search_results(root, window, query, hits, elapsed_ms):
+    """Показывает результаты поиска в отдельном окне, переиспользуя его между запросами."""
+    if window is None or not window.winfo_exists():
+        window = tk.Toplevel(root)
+        panel = ScrolledText(window, wrap='none')
+        panel.pack(fill="both", expand=True)
+        window.panel = panel
+    window.title(f'Поиск «{query}»: {len(hits)} за {elapsed_ms:.0f} мс')
+    panel = window.panel
+    panel['state'] = 'normal'
+    panel.delete('1.0', 'end')
+    # окно результатов не виртуализировано, так что многострочные сообщения показываем как есть
+    panel.insert('end', '\n'.join(map(unescape_control, reversed(hits))) if hits else 'Ничего не найдено')
+    panel['state'] = 'disabled'
+    return window
+
+
+async def run_searches(searcher, search_queue, show, wake=None):
+    """
+    Выполняет запросы из строки поиска в отдельном потоке, чтобы не тормозить
+    интерфейс; результат отдаёт в `show(query, hits, elapsed_ms)`.
+    """
+    wake = wake or asyncio.Event()
+    while True:
+        query = (await search_queue.get()).strip()
+        if not query:
+            continue
+        started = time.monotonic()
+        hits = await asyncio.to_thread(searcher.search, query)
+        elapsed_ms = (time.monotonic() - started) * 1000
+        try:
+            show(query, hits, elapsed_ms)
+        except tk.TclError:
+            raise TkAppClosed()
+        wake.set()
 
 
 def create_status_panel(root_frame):
@@ -125,12 +437,13 @@ def create_status_panel(root_frame):
     return (nickname_label, status_read_label, status_write_label)
 
 
-async def draw(messages_queue, sending_queue, status_updates_queue):
+def build_window(submit, on_search=None):
+    """Создаёт окно чата. `submit(text)` отправляет ввод, `on_search(query)` — запрос поиска."""
     root = tk.Tk()
 
     root.title('Чат Майнкрафтера')
 
-    root_frame = tk.Frame()
+    root_frame = tk.Frame(root)
     root_frame.pack(fill="both", expand=True)
 
     status_labels = create_status_panel(root_frame)
@@ -141,17 +454,218 @@ async def draw(messages_queue, sending_queue, status_updates_queue):
     input_field = tk.Entry(input_frame)
     input_field.pack(side="left", fill=tk.X, expand=True)
 
-    input_field.bind("<Return>", lambda event: process_new_message(input_field, sending_queue))
+    input_field.bind("<Return>", lambda event: process_new_message(input_field, submit))
 
     send_button = tk.Button(input_frame)
     send_button["text"] = "Отправить"
-    send_button["command"] = lambda: process_new_message(input_field, sending_queue)
+    send_button["command"] = lambda: process_new_message(input_field, submit)
     send_button.pack(side="left")
 
+    if on_search is not None:
+        create_search_panel(root_frame, on_search)
+
     conversation_panel = ScrolledText(root_frame, wrap='none')
     conversation_panel.pack(side="top", fill="both", expand=True)
 
+    return root, root_frame, status_labels, conversation_panel, input_field
+
+
+async def draw(feed, sending_queue, status_updates_queue, searcher=None, max_lines=MAX_PANEL_LINES,
+               pager=None, tk_max_interval=TK_MAX_INTERVAL):
+    search_queue = asyncio.Queue()
+    root, root_frame, status_labels, conversation_panel, _ = build_window(
+        lambda text: offer(sending_queue, OutgoingMessage(text)),
+        search_queue.put_nowait if searcher is not None else None,
+    )
+
+    search_window = None
+
+    def show_results(query, hits, elapsed_ms):
+        nonlocal search_window
+        search_window = show_search_results(root, search_window, query, hits, elapsed_ms)
+
+    wake = asyncio.Event()
+
     async with anyio.create_task_group() as tg:
-        tg.start_soon(update_tk, root_frame)
-        tg.start_soon(update_conversation_history, conversation_panel, messages_queue)
-        tg.start_soon(update_status_panel, status_labels, status_updates_queue)
\ No newline at end of file
+        tg.start_soon(update_tk, root_frame, wake, TK_MIN_INTERVAL, tk_max_interval)
+        tg.start_soon(update_conversation_history, conversation_panel, feed, max_lines, pager, wake)
+        tg.start_soon(update_status_panel, status_labels, status_updates_queue, wake)
+        if searcher is not None:
+            tg.start_soon(run_searches, searcher, search_queue, show_results, wake)
+
+
+class TkThread:
+    """
+    Окно чата в отдельном потоке со своим mainloop. С циклом asyncio общается
+    только через `inbox` (пачки сообщений, статусов, результатов поиска, ошибки,
+    не принятый очередью отправки ввод) и
+    колбэки, которые переносят ввод в цикл через call_soon_threadsafe.
+    Долгая вставка, ресайз окна или модальный диалог не задерживают сеть
+    и watchdog.
+    """
+
+    def __init__(self, loop, sending_queue, search_queue=None, max_lines=MAX_PANEL_LINES, pager=None,
+                 max_interval=TK_MAX_INTERVAL):
+        self.loop = loop
+        self.sending_queue = sending_queue
+        self.search_queue = search_queue
+        self.max_lines = max_lines
+        self.pager = pager
+        self.max_interval = max_interval
+        self.inbox = ThreadChannel()
+        self.closed = loop.create_future()
+        self._stop = threading.Event()
+        self._interval = FRAME_INTERVAL
+        self._held = []
+        self._pending = None
+        self._search_window = None
+
+    def stop(self):
+        self._stop.set()
+
+    def _submit(self, text):
+        if self.sending_queue.full():
+            return False
+        # окончательная проверка — в цикле: очередь могла заполниться, пока вызов шёл туда
+        self.loop.call_soon_threadsafe(self._enqueue, text)
+        return True
+
+    def _enqueue(self, text):
+        if not offer(self.sending_queue, OutgoingMessage(text)):
+            self.inbox.put(('rejected', text))
+
+    def _search(self, query):
+        self.loop.call_soon_threadsafe(self.search_queue.put_nowait, query)
+
+    def show_search_results(self, query, hits, elapsed_ms):
+        self.inbox.put(('search', (query, hits, elapsed_ms)))
+
+    def show_error(self, title, message):
+        """Модальная ошибка в потоке Tk; если окно уже закрывается, оно дождётся, пока её закроют."""
+        self.inbox.put(('error', (title, message)))
+
+    def _set_closed(self, error):
+        if self.closed.done():
+            return
+        if error is None or isinstance(error, tk.TclError):
+            self.closed.set_exception(TkAppClosed())
+        else:
+            self.closed.set_exception(error)
+
+    def run(self):
+        """Точка входа потока Tk."""
+        error = None
+        try:
+            self.root, _, self.status_labels, panel, self.input_field = build_window(
+                self._submit,
+                self._search if self.search_queue is not None else None,
+            )
+            self.view = ConversationView(panel, self.pager, self.max_lines)
+            reset_status(self.status_labels)
+            with ThreadPoolExecutor(1, thread_name_prefix='scrollback') as self._fetcher:
+                self.root.after(0, self._tick)
+                self.root.mainloop()
+        except BaseException as e:
+            error = e
+        finally:
+            self.loop.call_soon_threadsafe(self._set_closed, error)
+
+    def _page(self):
+        """Подгрузка истории при прокрутке: чтение — в отдельном потоке, вставка — здесь."""
+        if self._pending is not None:
+            direction, requested, future = self._pending
+            if not future.done():
+                return True
+            self._pending = None
+            self.view.apply(direction, future.result(), requested)
+            return True
+        direction = self.view.wants()
+        if direction:
+            a, b = self.view.range_for(direction)
+            self._pending = (direction, b - a, self._fetcher.submit(self.view.fetch, a, b))
+            return True
+        return False
+
+    def _tick(self):
+        try:
+            self._update()
+        except tk.TclError:
+            # окно уже закрыто — mainloop сейчас завершится
+            return
+        except Exception:
+            # сбой одного кадра не должен останавливать окно
+            logger.exception("tk update failed")
+            self.root.after(int(self._interval * 1000), self._tick)
+
+    def _update(self):
+        items = self.inbox.drain()
+        for kind, payload in items:
+            if kind == 'error':
+                # до закрытия окна: иначе ошибку никто не увидит
+                messagebox.showerror(*payload, parent=self.root)
+        if self._stop.is_set():
+            self.root.destroy()
+            return
+        for kind, payload in items:
+            if kind == 'messages':
+                self._held.extend(payload)
+            elif kind == 'status':
+                for msg in payload:
+                    apply_status(self.status_labels, msg)
+            elif kind == 'search':
+                self._search_window = show_search_results(self.root, self._search_window, *payload)
+            elif kind == 'rejected':
+                restore_input(self.input_field, payload)
+        busy = self._page()
+        if self._held and self._pending is None:
+            # пока идёт чтение истории, позиции строк менять нельзя — копим
+            self.view.add_live(self._held)
+            self._held = []
+        self._interval = FRAME_INTERVAL if items or busy else min(self._interval * 2, self.max_interval)
+        self.root.after(int(self._interval * 1000), self._tick)
+
+
+async def next_batch(queue):
+    """Ждёт элемент очереди и забирает вместе с ним всё, что уже накопилось."""
+    return drain_queue(queue, await queue.get())
+
+
+async def forward_to_thread(get_batch, inbox, kind, frame_interval=FRAME_INTERVAL,
+                            max_backlog=INBOX_MAX_BATCHES):
+    """
+    Переносит пачки из `get_batch()` в канал потока Tk, не чаще раза за кадр.
+    Пока поток Tk не разобрал `max_backlog` пачек, новые не забираются: они
+    копятся в источнике, где действует его предел и политика переполнения.
+    """
+    while True:
+        while len(inbox) >= max_backlog:
+            await asyncio.sleep(frame_interval)
+        inbox.put((kind, await get_batch()))
+        await asyncio.sleep(frame_interval)
+
+
+async def draw_in_thread(feed, sending_queue, status_updates_queue, searcher=None,
+                         max_lines=MAX_PANEL_LINES, pager=None, tk_max_interval=TK_MAX_INTERVAL,
+                         on_start=None):
+    """
+    То же, что `draw`, но окно живёт в отдельном потоке (см. `TkThread`).
+    `on_start(ui)` получает окно, например чтобы показывать в нём ошибки.
+    При выходе ждёт, пока поток Tk закроет окно.
+    """
+    search_queue = asyncio.Queue() if searcher is not None else None
+    ui = TkThread(asyncio.get_running_loop(), sending_queue, search_queue, max_lines, pager, tk_max_interval)
+    thread = threading.Thread(target=ui.run, name='tk', daemon=True)
+    thread.start()
+    if on_start is not None:
+        on_start(ui)
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(forward_to_thread, feed.get_batch, ui.inbox, 'messages')
+            tg.start_soon(forward_to_thread, lambda: next_batch(status_updates_queue), ui.inbox, 'status')
+            if searcher is not None:
+                tg.start_soon(run_searches, searcher, search_queue, ui.show_search_results)
+            await ui.closed
+    finally:
+        ui.stop()
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(thread.join)
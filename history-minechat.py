@@ -0,0 +1,92 @@
+import argparse
+import datetime as dt
+import logging
+import os
+import time
+
+from utils import (
+    setup_logging,
+    expand_path_and_mkdirs,
+    DEFAULT_HISTORY,
+    DEFAULT_HISTORY_DB,
+)
+from core.history_db import SqliteHistory, SEARCH_LIMIT
+
+
+logger = logging.getLogger("history")
+
+TIME_FORMATS = ("%d.%m.%y %H:%M", "%d.%m.%Y %H:%M", "%d.%m.%y", "%d.%m.%Y")
+
+
+def parse_time(value: str) -> dt.datetime:
+    """Принимает `dd.mm.yy HH:MM` (как в истории), `dd.mm.yyyy` или ISO-формат."""
+    for fmt in TIME_FORMATS:
+        try:
+            return dt.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    try:
+        return dt.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"не удалось разобрать время: {value}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Indexed minechat history: import text history, query time ranges, full-text search.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--history-db",
+        default=os.getenv("MINECHAT_HISTORY_DB", DEFAULT_HISTORY_DB),
+        help="Путь к базе истории (ENV: MINECHAT_HISTORY_DB)",
+    )
+    parser.add_argument(
+        "--log-level",
+        default=os.getenv("MINECHAT_LOG_LEVEL", "INFO"),
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="Уровень логирования (ENV: MINECHAT_LOG_LEVEL)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="Импортировать текстовую историю (все сегменты) в базу.")
+    importer.add_argument(
+        "--history",
+        default=os.getenv("MINECHAT_HISTORY", DEFAULT_HISTORY),
+        help="Путь к текстовой истории (ENV: MINECHAT_HISTORY)",
+    )
+    importer.add_argument("--force", action="store_true", help="Импортировать повторно.")
+
+    ranger = commands.add_parser("range", help="Показать сообщения за интервал времени.")
+    ranger.add_argument("--since", type=parse_time, help="Начало интервала, например '14.10.26 14:00'.")
+    ranger.add_argument("--until", type=parse_time, help="Конец интервала (не включительно).")
+
+    searcher = commands.add_parser("search", help="Полнотекстовый поиск по истории.")
+    searcher.add_argument("query", nargs="+", help="Слова, которые должны встретиться в сообщении.")
+    searcher.add_argument("--limit", type=int, default=SEARCH_LIMIT, help="Сколько последних совпадений показать.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_logging(args.log_level)
+    db = SqliteHistory(expand_path_and_mkdirs(args.history_db))
+    try:
+        if args.command == "import":
+            count = db.import_text(os.path.expanduser(args.history), force=args.force)
+            logger.info("Импортировано строк: %d", count)
+        elif args.command == "range":
+            for line in db.range(args.since, args.until):
+                print(line)
+        elif args.command == "search":
+            started = time.monotonic()
+            hits = db.search(" ".join(args.query), args.limit)
+            for line in reversed(hits):
+                print(line)
+            logger.info("Найдено %d за %.1f мс", len(hits), (time.monotonic() - started) * 1000)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
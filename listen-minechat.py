@@ -1,20 +1,23 @@
 import asyncio
 import contextlib
-import datetime as dt
 import os
 import signal
+import time
 from typing import Optional
 
-import aiofiles
 import logging
+from core.backoff import Backoff, STABLE_AFTER_S
+from core import net
+from core.linereader import open_line_reader
+from core.sinks import SinkPipeline, FileSink, JsonLinesSink, StdoutSink
 from utils import (
     build_parser,
     setup_logging,
     DEFAULT_HOST,
     DEFAULT_LISTEN_PORT,
     DEFAULT_HISTORY,
-    RECONNECT_DELAY_START,
-    RECONNECT_DELAY_MAX,
+    add_history_storage_args,
+    add_reconnect_args,
 )
 
 
@@ -29,66 +32,76 @@ def _expand_history_path(path: str) -> str:
     return path
 
 
-def _now_ts() -> str:
-    """Вернёт отметку времени в формате [DD.MM.YY HH:MM]."""
-    return dt.datetime.now().strftime("[%d.%m.%y %H:%M]")
+def build_sinks(history_path: str, jsonl_path: Optional[str] = None, **rotation) -> SinkPipeline:
+    """Файл истории и консоль всегда, JSON-lines — если задан путь."""
+    sinks = [FileSink(history_path, **rotation), StdoutSink()]
+    if jsonl_path:
+        sinks.append(JsonLinesSink(_expand_history_path(jsonl_path)))
+    return SinkPipeline(sinks)
 
 
-async def log_line(line: str, history_path: str):
-    """Пишет строку в stdout и в файл (append) с таймстемпом."""
-    stamped = f"{_now_ts()} {line.rstrip()}"
-    print(stamped)
-    async with aiofiles.open(history_path, mode="a", encoding="utf-8") as f:
-        await f.write(stamped + "\n")
-
-
-async def read_chat_once(host: str, port: int, history_path: str):
-    """Один сеанс: подключиться, читать до закрытия/ошибки."""
-    reader, writer = await asyncio.open_connection(host, port)
+async def read_chat_once(host: str, port: int, sinks: SinkPipeline, on_established=None):
+    """Один сеанс: подключиться, читать до закрытия/ошибки. `on_established` вызывается после подключения."""
+    reader = await open_line_reader(host, port)
+    if on_established:
+        on_established()
     logger.info(f"Подключились к {host}:{port}")
-    await log_line("Установлено соединение", history_path)
+    sinks.publish("Установлено соединение")
 
     try:
         while True:
-            line = await reader.readline()
-            if not line:
-                await log_line("Соединение закрыто сервером", history_path)
+            lines = await reader.read_batch()
+            if not lines:
+                sinks.publish("Соединение закрыто сервером")
                 logger.info("Сервер закрыл соединение")
                 break
-            text = line.decode("utf-8", errors="replace").rstrip("\n")
-            logger.debug(text)
-            await log_line(text, history_path)
+            if logger.isEnabledFor(logging.DEBUG):
+                for text in lines:
+                    logger.debug(text)
+            sinks.publish_many(lines)
     finally:
-        writer.close()
+        reader.close()
         with contextlib.suppress(
             asyncio.CancelledError,
             ConnectionResetError,
             BrokenPipeError,
             OSError,
         ):
-            await writer.wait_closed()
+            await reader.wait_closed()
             logger.info("Сокет закрыт")
 
 
-async def read_chat_forever(host: str, port: int, history_path: str):
-    """Главный цикл: читает чат и переподключается при сбоях."""
-    delay = RECONNECT_DELAY_START
+async def read_chat_forever(host: str, port: int, sinks: SinkPipeline, backoff: Backoff | None = None):
+    """
+    Главный цикл: читает чат и переподключается при сбоях. Паузу задаёт
+    `backoff` (рост с джиттером и размыкатель); сеанс, проработавший
+    после подключения `STABLE_AFTER_S` секунд, сбрасывает счёт сбоев.
+    """
+    backoff = backoff or Backoff()
+    established_at = None
+
+    def established():
+        nonlocal established_at
+        established_at = time.monotonic()
+
     while True:
+        established_at = None
         try:
-            await read_chat_once(host, port, history_path)
-            await log_line(f"Повторное подключение через {delay}с…", history_path)
-            logger.info(f"Повторное подключение через {delay}с…")
-            await asyncio.sleep(delay)
-            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+            await read_chat_once(host, port, sinks, established)
+            message = "Повторное подключение"
         except (asyncio.CancelledError, KeyboardInterrupt):
             raise
         except Exception as e:
-            await log_line(f"Ошибка соединения: {type(e).__name__}: {e}", history_path)
+            sinks.publish(f"Ошибка соединения: {type(e).__name__}: {e}")
             logger.exception("Ошибка соединения")
-            await log_line(f"Повторная попытка через {delay}с…", history_path)
-            logger.info(f"Повторная попытка через {delay}с…")
-            await asyncio.sleep(delay)
-            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+            message = "Повторная попытка"
+        # таймаут подключения не «стабильный сеанс»: считаем только с момента подключения
+        if established_at is not None and time.monotonic() - established_at >= STABLE_AFTER_S:
+            backoff.reset()
+        delay = backoff.failure()
+        sinks.publish(f"{message} через {delay:.1f}с…")
+        logger.info(f"{message} через {delay:.1f}с…")
+        await asyncio.sleep(delay)
 
 
 def parse_args():
@@ -101,6 +114,14 @@ def parse_args():
         "--history",
         default=os.getenv("MINECHAT_HISTORY", DEFAULT_HISTORY),
     )
+    add_history_storage_args(parser)
+    add_reconnect_args(parser)
+    net.add_net_args(parser)
+    parser.add_argument(
+        "--jsonl",
+        default=os.getenv("MINECHAT_JSONL"),
+        help="Дополнительно писать сообщения в JSON-lines файл (ENV: MINECHAT_JSONL)",
+    )
     return parser.parse_args()
         
 
@@ -114,14 +135,22 @@ def _install_signal_handlers(loop: asyncio.AbstractEventLoop):
 async def amain():
     args = parse_args()
     setup_logging(args.log_level)
+    net.configure(args)
 
     host: str = args.host
     port: int = args.port
     history: str = _expand_history_path(args.history)
 
-    await log_line("Скрипт запущен. Наблюдаю за чатом…", history)
-    logger.info("Запущен режим наблюдения")
-    await read_chat_forever(host, port, history)
+    rotation = dict(
+        max_bytes=args.history_max_bytes,
+        daily=args.history_rotate_daily,
+        compress=not args.history_no_compress,
+    )
+    async with build_sinks(history, args.jsonl, **rotation) as sinks:
+        sinks.publish("Скрипт запущен. Наблюдаю за чатом…")
+        logger.info("Запущен режим наблюдения")
+        backoff = Backoff(args.reconnect_delay, args.reconnect_max_delay, args.breaker_after, args.breaker_cooldown)
+        await read_chat_forever(host, port, sinks, backoff)
 
 
 def main():
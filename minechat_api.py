@@ -2,37 +2,9 @@ import asyncio
 import json
 import logging
 
-logger = logging.getLogger("minechat.api")
-
-
-async def _readline_text(reader: asyncio.StreamReader) -> str:
-    """Считывает строку (bytes) и возвращает str без завершающего \\n."""
-    data = await reader.readline()
-    if not data:
-        return ""
-    return data.decode("utf-8", errors="replace").rstrip("\n")
-
+from core.codec import escape_control, readline_text
 
-def _escape_control(text: str) -> str:
-    """
-    Делает данные безопасными для протокола «1 сообщение = 1 строка».
-    Стратегия:
-      - реальные управляющие - печатимые escape-последовательности
-        \n -> \\n, \t - \\t
-      - удаляем NUL и прочие непечатимые управляющие
-    """
-    if text is None:
-        return ""
-
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = text.replace("\\", "\\\\")
-    text = text.replace("\n", r"\n")
-    text = text.replace("\t", r"\t")
-    cleaned = []
-    for ch in text:
-        if ch == "\\" or ch.isprintable():
-            cleaned.append(ch)
-    return "".join(cleaned)
+logger = logging.getLogger("minechat.api")
 
 
 async def register(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, nickname: str) -> dict:
@@ -46,45 +18,45 @@ async def register(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, n
       - сервер возвращает JSON с токеном: {"nickname": ..., "account_hash": ...}
     Возвращает dict с токеном.
     """
-    greet = await _readline_text(reader)
+    greet = await readline_text(reader)
     logger.debug(greet)
 
     writer.write(b"\n")
     await writer.drain()
     logger.debug("\\n (sent)")
 
-    prompt = await _readline_text(reader)
+    prompt = await readline_text(reader)
     logger.debug(prompt)
 
     writer.write(f"{nickname}\n".encode("utf-8"))
     await writer.drain()
     logger.debug("%s (sent)", nickname)
 
-    token_line = await _readline_text(reader)
+    token_line = await readline_text(reader)
     logger.debug(token_line)
     token_data = json.loads(token_line)
     return token_data
 
 
-async def authorise(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, token: str) -> bool:
+async def login(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, token: str) -> dict | None:
     """
     Авторизация по токену.
     Протокол:
       - сервер просит hash
       - отправляем token + \\n
       - сервер возвращает JSON:
-          * объект (валидный токен)
+          * объект (валидный токен) с nickname и account_hash
           * 'null' (битый токен) -> json.loads(...) == None
-    Возвращает True при успехе, False при невалидном токене.
+    Возвращает данные аккаунта или None при невалидном токене.
     """
-    greet = await _readline_text(reader)
+    greet = await readline_text(reader)
     logger.debug(greet)
 
     writer.write(f"{token}\n".encode("utf-8"))
     await writer.drain()
     logger.debug("<token> (sent)")
 
-    response = await _readline_text(reader)
+    response = await readline_text(reader)
     logger.debug(response)
 
     try:
@@ -92,16 +64,26 @@ async def authorise(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
     except json.JSONDecodeError:
         payload = None
 
-    return payload is not None
+    return payload if isinstance(payload, dict) else None
 
 
-async def submit_message(writer: asyncio.StreamWriter, text: str) -> None:
+async def authorise(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, token: str) -> bool:
+    """То же, что `login`: True при успехе, False при невалидном токене."""
+    return await login(reader, writer, token) is not None
+
+
+def write_message(writer: asyncio.StreamWriter, text: str) -> None:
     """
-    Отправляет сообщение как одну логическую строку.
-    Реальные переводы строк и табы превращаются в видимые \\n и \\t.
+    Кладёт сообщение в буфер сокета как одну логическую строку, не дожидаясь
+    отправки. Реальные переводы строк и табы превращаются в видимые \\n и \\t.
     """
-    safe = _escape_control(text)
+    safe = escape_control(text)
     body = safe + "\n\n"
     writer.write(body.encode("utf-8"))
+
+
+async def submit_message(writer: asyncio.StreamWriter, text: str) -> None:
+    """Отправляет сообщение (см. `write_message`) и ждёт, пока буфер уйдёт в сокет."""
+    write_message(writer, text)
     await writer.drain()
     logger.debug("(message sent)")
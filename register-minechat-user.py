@@ -12,6 +12,7 @@ from utils import (
     expand_path_and_mkdirs,
 )
 from minechat_api import register as mc_register
+from core import net
 
 
 logger = logging.getLogger("registrar")
@@ -41,12 +42,14 @@ def parse_args():
         action="store_true",
         help="Перезаписать существующий файл токена.",
     )
+    net.add_net_args(parser)
     return parser.parse_args()
 
 
 async def amain():
     args = parse_args()
     setup_logging(args.log_level)
+    net.configure(args)
 
     token_path = os.path.expanduser(args.token_file)
     if os.path.exists(token_path) and not args.force:
@@ -56,7 +59,7 @@ async def amain():
 
     reader = writer = None
     try:
-        reader, writer = await asyncio.open_connection(args.host, args.port)
+        reader, writer = await net.open_connection(args.host, args.port)
         token_data = await mc_register(reader, writer, args.nickname)
         print(json.dumps(token_data, ensure_ascii=False, indent=4))
 
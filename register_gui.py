@@ -18,6 +18,8 @@ from utils import (
     expand_path_and_mkdirs,
 )
 from minechat_api import register as mc_register
+from core import net
+import gui
 
 
 class TkAppClosed(Exception):
@@ -33,13 +35,12 @@ class RegisterRequest:
     token_path: str
 
 
-async def update_tk(root: tk.Misc, interval: float = 1 / 120):
-    while True:
-        try:
-            root.update()
-        except tk.TclError:
-            raise TkAppClosed()
-        await anyio.sleep(interval)
+async def update_tk(root: tk.Misc, wake: Optional[asyncio.Event] = None):
+    """Адаптивная прокачка событий Tk из gui.update_tk: в простое окно почти не тратит CPU."""
+    try:
+        await gui.update_tk(root, wake)
+    except gui.TkAppClosed:
+        raise TkAppClosed()
 
 
 def build_gui():
@@ -115,7 +116,8 @@ def build_gui():
     return widgets
 
 
-async def log_consumer(log_widget: ScrolledText, queue: asyncio.Queue):
+async def log_consumer(log_widget: ScrolledText, queue: asyncio.Queue, wake: Optional[asyncio.Event] = None):
+    wake = wake or asyncio.Event()
     while True:
         line = await queue.get()
         try:
@@ -127,6 +129,7 @@ async def log_consumer(log_widget: ScrolledText, queue: asyncio.Queue):
             log_widget["state"] = "disabled"
         except tk.TclError:
             raise TkAppClosed()
+        wake.set()
 
 
 def push_log(queue: asyncio.Queue, text: str):
@@ -140,7 +143,7 @@ async def perform_registration(req: RegisterRequest, log_q: asyncio.Queue) -> di
     reader = writer = None
     push_log(log_q, f"Подключаюсь к {req.host}:{req.port}…")
     try:
-        reader, writer = await asyncio.open_connection(req.host, req.port)
+        reader, writer = await net.open_connection(req.host, req.port)
 
         # minechat_api.register выполнит протокол регистрации:
         #   - сервер просит hash → отправляем пустую строку
@@ -229,6 +232,7 @@ async def run_app():
 
     cmd_queue: asyncio.Queue[RegisterRequest] = asyncio.Queue()
     log_queue: asyncio.Queue[str] = asyncio.Queue()
+    wake = asyncio.Event()
 
     def on_register():
         if w["register_btn"]["state"] == "disabled":
@@ -252,8 +256,8 @@ async def run_app():
 
     try:
         async with anyio.create_task_group() as tg:
-            tg.start_soon(update_tk, root)
-            tg.start_soon(log_consumer, w["log"], log_queue)
+            tg.start_soon(update_tk, root, wake)
+            tg.start_soon(log_consumer, w["log"], log_queue, wake)
             tg.start_soon(register_controller, w, cmd_queue, log_queue)
     except* TkAppClosed:
         pass
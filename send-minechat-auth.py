@@ -1,17 +1,18 @@
 import asyncio
-import json
 import os
 import contextlib
 import logging
 from utils import (
     build_parser,
     setup_logging,
-    expand_path_and_mkdirs,
+    load_token,
     DEFAULT_HOST,
     DEFAULT_SEND_PORT,
     DEFAULT_TOKEN_FILE,
 )
 from minechat_api import authorise as mc_authorise, submit_message as mc_submit
+from core import net
+from core.exceptions import InvalidToken
 
 
 logger = logging.getLogger("sender")
@@ -33,26 +34,24 @@ def parse_args():
         required=True,
         help="Message to send (empty line ends message)."
         )
-    
+    net.add_net_args(parser)
     return parser.parse_args()
 
 
 async def amain():
     args = parse_args()
     setup_logging(args.log_level)
+    net.configure(args)
 
-    token_path = os.path.expanduser(args.token_file)
-    if not os.path.exists(token_path):
-        print("Токен не найден. Сначала зарегистрируйтесь (register-minechat-user.py).")
+    try:
+        token = load_token(args.token_file)
+    except InvalidToken as e:
+        print(e)
         return
 
-    with open(token_path, encoding="utf-8") as f:
-        data = json.load(f)
-        token = data.get("account_hash")
-
     reader = writer = None
     try:
-        reader, writer = await asyncio.open_connection(args.host, args.port)
+        reader, writer = await net.open_connection(args.host, args.port)
         ok = await mc_authorise(reader, writer, token)
         if not ok:
             print("Неизвестный токен. Проверьте его или зарегистрируйте заново.")
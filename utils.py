@@ -1,14 +1,22 @@
 import os
 import argparse
+import json
 import logging
 
+from core.exceptions import InvalidToken
+
 DEFAULT_HOST = "minechat.dvmn.org"
 DEFAULT_LISTEN_PORT = 5000
 DEFAULT_SEND_PORT = 5050
 DEFAULT_HISTORY = "chat_history.txt"
+DEFAULT_HISTORY_DB = "chat_history.sqlite3"
 DEFAULT_TOKEN_FILE = "minechat_token.json"
+DEFAULT_OUTBOX = "minechat_outbox.jsonl"
 RECONNECT_DELAY_START = 2
 RECONNECT_DELAY_MAX = 60
+BREAKER_AFTER = 10
+BREAKER_COOLDOWN = 300
+DEFAULT_HISTORY_MAX_BYTES = 0
 
 
 def setup_logging(level: str = "DEBUG"):
@@ -27,6 +35,17 @@ def expand_path_and_mkdirs(path: str) -> str:
     return full
 
 
+def load_token(token_file: str) -> str:
+    path = os.path.expanduser(token_file)
+    if not os.path.exists(path):
+        raise InvalidToken("Токен не найден. Сначала зарегистрируйтесь (register-minechat-user.py).")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("account_hash")
+    except Exception as e:
+        raise InvalidToken(f"Не удалось прочитать токен: {e}")
+
+
 try:
     import configargparse
     HAS_CAP = True
@@ -89,3 +108,60 @@ def build_parser(description: str, default_host: str, default_port: int):
             help="Уровень логирования (ENV: MINECHAT_LOG_LEVEL)"
         )
     return parser
+
+
+def env_flag(name: str) -> bool:
+    """Булев флаг из переменной окружения: 1/true/yes/on."""
+    return os.getenv(name, "").lower() in ("1", "true", "yes", "on")
+
+
+def add_history_storage_args(parser):
+    """Параметры сегментированного хранения истории (общие для GUI и слушателя)."""
+    parser.add_argument(
+        "--history-max-bytes",
+        type=int,
+        default=int(os.getenv("MINECHAT_HISTORY_MAX_BYTES", DEFAULT_HISTORY_MAX_BYTES)),
+        help="Закрывать сегмент истории по достижении размера в байтах, 0 — не закрывать (ENV: MINECHAT_HISTORY_MAX_BYTES)",
+    )
+    parser.add_argument(
+        "--history-rotate-daily",
+        action="store_true",
+        default=env_flag("MINECHAT_HISTORY_ROTATE_DAILY"),
+        help="Начинать новый сегмент истории каждые сутки (ENV: MINECHAT_HISTORY_ROTATE_DAILY)",
+    )
+    parser.add_argument(
+        "--history-no-compress",
+        action="store_true",
+        default=env_flag("MINECHAT_HISTORY_NO_COMPRESS"),
+        help="Не сжимать закрытые сегменты истории (ENV: MINECHAT_HISTORY_NO_COMPRESS)",
+    )
+    return parser
+
+
+def add_reconnect_args(parser):
+    """Параметры паузы между переподключениями (общие для GUI и слушателя)."""
+    parser.add_argument(
+        "--reconnect-delay",
+        type=float,
+        default=float(os.getenv("MINECHAT_RECONNECT_DELAY", RECONNECT_DELAY_START)),
+        help="Начальная пауза перед переподключением, сек; растёт вдвое с каждым сбоем (ENV: MINECHAT_RECONNECT_DELAY)",
+    )
+    parser.add_argument(
+        "--reconnect-max-delay",
+        type=float,
+        default=float(os.getenv("MINECHAT_RECONNECT_MAX_DELAY", RECONNECT_DELAY_MAX)),
+        help="Предел паузы перед переподключением, сек (ENV: MINECHAT_RECONNECT_MAX_DELAY)",
+    )
+    parser.add_argument(
+        "--breaker-after",
+        type=int,
+        default=int(os.getenv("MINECHAT_BREAKER_AFTER", BREAKER_AFTER)),
+        help="После стольких сбоев подряд переподключаться редко, 0 — никогда (ENV: MINECHAT_BREAKER_AFTER)",
+    )
+    parser.add_argument(
+        "--breaker-cooldown",
+        type=float,
+        default=float(os.getenv("MINECHAT_BREAKER_COOLDOWN", BREAKER_COOLDOWN)),
+        help="Пауза между попытками при разомкнутом размыкателе, сек (ENV: MINECHAT_BREAKER_COOLDOWN)",
+    )
+    return parser